@@ -0,0 +1,74 @@
+-- changed line ranges of attached buffers, one per consumer
+--
+-- a range holds the first changed line and the end of the change in the
+-- lines the consumer saw last, delta is the number of lines added since
+
+local M = {}
+
+local buffers = {}
+
+local function on_lines(_, bufnr, _, first, last, new_last)
+  local consumers = buffers[bufnr]
+  if consumers == nil or next(consumers) == nil then
+    buffers[bufnr] = nil
+    return true
+  end
+  for _, range in pairs(consumers) do
+    if range.first == nil then
+      range.first, range.last, range.delta = first, last, 0
+    else
+      range.first = math.min(range.first, first)
+      range.last = math.max(range.last, last - range.delta)
+    end
+    range.delta = range.delta + new_last - last
+  end
+end
+
+local function on_reload(_, bufnr)
+  local consumers = buffers[bufnr]
+  if consumers ~= nil then
+    for consumer in pairs(consumers) do
+      consumers[consumer] = {full = true}
+    end
+  end
+end
+
+local function on_detach(_, bufnr)
+  buffers[bufnr] = nil
+end
+
+local function all_lines(bufnr)
+  return {0, -1, vim.api.nvim_buf_get_lines(bufnr, 0, -1, false)}
+end
+
+-- lines changed since the last call of the consumer as {first, last, lines},
+-- every line when full is set or the buffer was not seen before,
+-- and an empty list when nothing changed
+function M.take(bufnr, consumer, full)
+  local consumers = buffers[bufnr]
+  if consumers == nil then
+    local attached = vim.api.nvim_buf_attach(bufnr, false, {
+      on_lines = on_lines,
+      on_reload = on_reload,
+      on_detach = on_detach,
+    })
+    if not attached then
+      return all_lines(bufnr)
+    end
+    consumers = {}
+    buffers[bufnr] = consumers
+  end
+
+  local range = consumers[consumer]
+  consumers[consumer] = {}
+  if full or range == nil or range.full then
+    return all_lines(bufnr)
+  end
+  if range.first == nil then
+    return {}
+  end
+  return {range.first, range.last, vim.api.nvim_buf_get_lines(bufnr,
+    range.first, range.last + range.delta, false)}
+end
+
+return M
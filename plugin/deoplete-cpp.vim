@@ -3,6 +3,67 @@ if exists("g:loaded_deoplete_cpp")
 endif
 let g:loaded_deoplete_cpp = 1
 
+" common
+let g:deoplete#sources#clang#async_reparse =
+\   get(g:, "deoplete#sources#clang#async_reparse", 1)
+
+let g:deoplete#sources#clang#async_completion =
+\   get(g:, "deoplete#sources#clang#async_completion", 1)
+
+let g:deoplete#sources#clang#reparse_debounce =
+\   get(g:, "deoplete#sources#clang#reparse_debounce", 300)
+
+let g:deoplete#sources#clang#cache_size =
+\   get(g:, "deoplete#sources#clang#cache_size", 64)
+
+let g:deoplete#sources#clang#max_translation_units =
+\   get(g:, "deoplete#sources#clang#max_translation_units", 16)
+
+let g:deoplete#sources#clang#max_memory =
+\   get(g:, "deoplete#sources#clang#max_memory", 2048)
+
+let g:deoplete#sources#clang#workers =
+\   get(g:, "deoplete#sources#clang#workers", 0)
+
+let g:deoplete#sources#clang#worker_max_memory =
+\   get(g:, "deoplete#sources#clang#worker_max_memory", 4096)
+
+let g:deoplete#sources#clang#max_candidates =
+\   get(g:, "deoplete#sources#clang#max_candidates", 1000)
+
+let g:deoplete#sources#clang#preamble_cache_size =
+\   get(g:, "deoplete#sources#clang#preamble_cache_size", 1024)
+
+let g:deoplete#sources#clang#compilation_database =
+\   get(g:, "deoplete#sources#clang#compilation_database", '')
+
+let g:deoplete#sources#clang#include_index_excludes =
+\   get(g:, "deoplete#sources#clang#include_index_excludes",
+\       ['.*', 'node_modules', '__pycache__', 'CMakeFiles', 'bazel-*'])
+
+let g:deoplete#sources#clang#cache_directory =
+\   get(g:, "deoplete#sources#clang#cache_directory", '')
+
+" release unsaved content of closed buffers
+function! s:buffer_unloaded(bufnr) abort
+  let l:filetypes = ['c', 'cpp', 'objc', 'objcpp', 'arduino']
+  if index(l:filetypes, getbufvar(a:bufnr, '&filetype')) >= 0
+    silent! call deoplete#send_event('BufUnload')
+  endif
+endfunction
+
+" runtime statistics of the completer, shown by the source of the buffer
+function! DeopleteCppShowStats(lines) abort
+  echo join(a:lines, "\n")
+endfunction
+
+command! DeopleteCppStats call deoplete#send_event('DeopleteCppStats')
+
+augroup deoplete_cpp
+  autocmd!
+  autocmd BufDelete,BufUnload * call s:buffer_unloaded(str2nr(expand('<abuf>')))
+augroup END
+
 " c
 let g:deoplete#sources#c#standard =
 \   get(g:, "deoplete#sources#c#standard", 99)
@@ -71,6 +132,11 @@ let g:deoplete#sources#cpp#cuda_root =
 \   '/usr/local/cuda')
 
 
+" identifier
+let g:deoplete#sources#identifier#max_identifiers =
+\   get(g:, "deoplete#sources#identifier#max_identifiers", 10000)
+
+
 " objc/objc++
 let g:deoplete#sources#objc#definitions =
 \   get(g:, "deoplete#sources#objc#definitions", ['DEBUG'])
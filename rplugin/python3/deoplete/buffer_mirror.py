@@ -0,0 +1,95 @@
+"""
+copy of buffer lines kept in sync with the editor
+
+neovim sends the changed lines of attached buffers only, vim is polled
+with b:changedtick and sends a buffer again when it changed
+"""
+
+import os
+
+
+def changed_range(old, new):
+  """
+  (first, last, lines) such that old[first:last] = lines turns old into new
+  """
+  limit = min(len(old), len(new))
+  first = 0
+  while first < limit and old[first] == new[first]:
+    first += 1
+  suffix = 0
+  while suffix < limit - first and old[-1 - suffix] == new[-1 - suffix]:
+    suffix += 1
+  return first, len(old) - suffix, new[first:len(new) - suffix]
+
+
+class BufferMirror(object):
+  def __init__(self, vim, on_change=None):
+    self._vim = vim
+    # called as on_change(bufnr, first, last, lines) when lines[first:last]
+    # were replaced, last is None when every line was replaced
+    self._on_change = on_change
+    self._consumer = '%d:%d' % (os.getpid(), id(self))
+    self._attach = None
+    # bufnr -> [changedtick, lines, content]
+    self._buffers = {}
+
+  def _take(self, bufnr):
+    mirror = self._buffers.get(bufnr)
+    change = self._vim.call('luaeval',
+      'require("deoplete_cpp").take(_A[1], _A[2], _A[3])',
+      [bufnr, self._consumer, mirror is None])
+    if not change:
+      return mirror
+
+    first, last, lines = change
+    if mirror is None or last < 0:
+      mirror = [None, lines, None]
+      self._buffers[bufnr] = mirror
+      self._changed(bufnr, 0, None, lines)
+    else:
+      mirror[1][first:last] = lines
+      mirror[2] = None
+      self._changed(bufnr, first, last, lines)
+    return mirror
+
+  def _poll(self, bufnr):
+    mirror = self._buffers.get(bufnr)
+    changedtick = self._vim.call('getbufvar', bufnr, 'changedtick')
+    if mirror is None or mirror[0] != changedtick:
+      lines = self._vim.call('getbufline', bufnr, 1, '$')
+      if mirror is None:
+        self._changed(bufnr, 0, None, lines)
+      elif self._on_change is not None:
+        self._changed(bufnr, *changed_range(mirror[1], lines))
+      mirror = [changedtick, lines, None]
+      self._buffers[bufnr] = mirror
+    return mirror
+
+  def _changed(self, bufnr, first, last, lines):
+    if self._on_change is not None:
+      self._on_change(bufnr, first, last, lines)
+
+  def sync(self, bufnr):
+    """
+    bring the lines of the buffer up to date
+    """
+    if self._attach is None:
+      self._attach = bool(self._vim.call('has', 'nvim-0.5'))
+    return self._take(bufnr) if self._attach else self._poll(bufnr)
+
+  def content(self, bufnr):
+    """
+    retrieve content of the buffer
+    """
+    mirror = self.sync(bufnr)
+    if mirror[2] is None:
+      mirror[2] = '\n'.join(mirror[1])
+    return mirror[2]
+
+  def retain(self, bufnrs):
+    """
+    forget buffers which are not listed
+    """
+    for bufnr in list(self._buffers):
+      if bufnr not in bufnrs:
+        del self._buffers[bufnr]
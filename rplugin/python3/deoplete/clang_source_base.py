@@ -1,31 +1,303 @@
 import os
 import ctypes
-import glob
 import threading
+import time
+
+from buffer_mirror import BufferMirror
+
+
+_library = None
+_library_lock = threading.Lock()
 
 
 def import_library():
-  current_dir = os.path.dirname(os.path.realpath(__file__))
-  clang_location = os.path.join(current_dir,
-    '../../../build/clang/lib/libclang.so')
+  """
+  load libclang and the completer module on first use,
+  later calls return the module loaded the first time
+  """
+  global _library
+  with _library_lock:
+    if _library is None:
+      current_dir = os.path.dirname(os.path.realpath(__file__))
+      clang_location = os.path.join(current_dir,
+        '../../../build/clang/lib/libclang.so')
+
+      ctypes.cdll.LoadLibrary(clang_location)
+
+      try:
+        import clang_completer
+        _library = clang_completer
+      except ImportError:
+        _library = False
+    return _library
+
+
+def completer_stats(completer):
+  """
+  counters of a ClangCompleter as plain values
+  """
+  units = []
+  for unit in completer.stats():
+    units.append({
+      'file': unit.file,
+      'key': unit.key,
+      'parses': unit.parses,
+      'reparses': unit.reparses,
+      'last_parse_ms': unit.last_parse_ms,
+      'average_parse_ms': unit.average_parse_ms,
+      'completions': unit.completions,
+      'last_complete_ms': unit.last_complete_ms,
+      'average_complete_ms': unit.average_complete_ms,
+      'results': unit.results,
+      'memory_usage': unit.memory_usage,
+    })
+  return {
+    'cache_hits': completer.cache_hits(),
+    'cache_misses': completer.cache_misses(),
+    'cache_evictions': completer.cache_evictions(),
+    'cache_bytes': completer.cache_bytes(),
+    'cache_max_bytes': completer.cache_max_bytes(),
+    'preamble_cache_hits': completer.preamble_cache_hits(),
+    'preamble_cache_builds': completer.preamble_cache_builds(),
+    'memory_usage': completer.memory_usage(),
+    'unsaved_files': completer.file_count(),
+    'unsaved_bytes': completer.unsaved_bytes(),
+    'units': units,
+  }
+
+
+def format_stats(stats):
+  """
+  lines describing the statistics of every completer
+  """
+  megabyte = 1024.0 * 1024.0
+  lines = []
+  for i, completer in enumerate(stats):
+    if len(stats) > 1:
+      lines.append('completer %d' % (i + 1))
+    lookups = completer['cache_hits'] + completer['cache_misses']
+    hit_rate = 100.0 * completer['cache_hits'] / lookups if lookups else 0.0
+    lines.append('completion cache: %d hits, %d misses (%.1f%%), '
+      '%.1f of %.1f MB, %d evictions' % (completer['cache_hits'],
+      completer['cache_misses'], hit_rate,
+      completer['cache_bytes'] / megabyte,
+      completer['cache_max_bytes'] / megabyte,
+      completer['cache_evictions']))
+    lines.append('preamble cache: %d hits, %d builds' % (
+      completer['preamble_cache_hits'], completer['preamble_cache_builds']))
+    lines.append('translation units: %d using %.1f MB, '
+      'unsaved buffers: %d holding %.1f KB' % (len(completer['units']),
+      completer['memory_usage'] / megabyte, completer['unsaved_files'],
+      completer['unsaved_bytes'] / 1024.0))
+    for unit in completer['units']:
+      lines.append('  %s: %d parses, %d reparses, parse %.1f ms '
+        '(avg %.1f ms), %d completions, complete %.1f ms (avg %.1f ms), '
+        '%d results, %.1f MB' % (unit['file'], unit['parses'],
+        unit['reparses'], unit['last_parse_ms'], unit['average_parse_ms'],
+        unit['completions'], unit['last_complete_ms'],
+        unit['average_complete_ms'], unit['results'],
+        unit['memory_usage'] / megabyte))
+  return lines
+
+
+class ClangCompletionEngine(object):
+  """
+  completer shared by every clang source working on the same project,
+  translation units are kept apart by the argument manager they use
+  """
+
+  def __init__(self, debounce=0.3, cache_bytes=None,
+      max_translation_units=0, max_memory=0, completer=None,
+      preamble_cache=None):
+    self._completer = completer or import_library().ClangCompleter()
+    if cache_bytes is not None:
+      self._completer.set_cache_max_bytes(cache_bytes)
+    self._completer.set_max_translation_units(max_translation_units)
+    self._completer.set_max_memory(max_memory)
+    if preamble_cache is not None:
+      # (directory, max_bytes) of precompiled preambles kept on disk
+      self._completer.set_preamble_cache(*preamble_cache)
+    self._runner = None
+
+    # the completer is not thread safe, every call goes through this lock
+    self._lock = threading.Lock()
+    # pending reparse requests,
+    # (filepath, id(arg_manager)) -> (content, arg_manager, deadline)
+    self._pending = {}
+    self._pending_cond = threading.Condition()
+    self._debounce = debounce
+
+  def parse(self, filepath, content, arg_manager):
+    with self._lock:
+      self._completer.Parse(filepath, content, arg_manager)
+      self._completer.Update()
+
+  def schedule(self, filepath, content, arg_manager):
+    with self._pending_cond:
+      self._pending[(filepath, id(arg_manager))] = (content, arg_manager,
+        time.time() + self._debounce)
+      if self._runner is None:
+        self._runner = threading.Thread(target=self._run, daemon=True)
+        self._runner.start()
+      self._pending_cond.notify()
+
+  def flush(self, filepath, content, arg_manager):
+    """
+    reparse right away if a reparse is still waiting for this file
+    """
+    if self._take_pending((filepath, id(arg_manager))):
+      self.parse(filepath, content, arg_manager)
+
+  def code_complete(self, filepath, content, line, column, arg_manager,
+      prefix='', max_results=0):
+    with self._lock:
+      return self._completer.CodeCompleteCandidates(filepath, content, line,
+        column, arg_manager, prefix, max_results)
+
+  def remove_closed(self, loaded):
+    with self._lock:
+      for filepath in self._completer.files():
+        if filepath not in loaded:
+          self._completer.RemoveFile(filepath)
 
-  ctypes.cdll.LoadLibrary(clang_location)
+      with self._pending_cond:
+        for key in list(self._pending):
+          if key[0] not in loaded:
+            del self._pending[key]
 
-  try:
-    import clang_completer
-    return clang_completer
-  except ImportError:
-    return False
+  def stats(self):
+    """
+    statistics of the completer, one entry per completer
+    """
+    with self._lock:
+      if hasattr(self._completer, 'completer_stats'):
+        # completer running in a worker process
+        return [self._completer.completer_stats()]
+      return [completer_stats(self._completer)]
+
+  def _take_pending(self, key):
+    with self._pending_cond:
+      return self._pending.pop(key, None)
+
+  def _run(self):
+    while True:
+      with self._pending_cond:
+        while not self._pending:
+          self._pending_cond.wait()
+
+        key = min(self._pending, key=lambda k: self._pending[k][2])
+        content, arg_manager, deadline = self._pending[key]
+        remaining = deadline - time.time()
+        if remaining > 0:
+          # still typing, wait for the buffer to become quiet
+          self._pending_cond.wait(remaining)
+          continue
+        del self._pending[key]
+
+      self.parse(key[0], content, arg_manager)
 
 
-clang_completer = import_library()
+class AsyncCompletion(object):
+  """
+  completions computed on a background thread, a request supersedes the
+  request still waiting for the same buffer and the result of the one
+  already running is dropped, so fast typing costs at most one stale
+  completion
+  """
+
+  def __init__(self, complete):
+    self._complete = complete
+    self._cond = threading.Condition()
+    # buffer -> (request, args) waiting for the runner
+    self._waiting = {}
+    # buffer -> request being completed
+    self._running = {}
+    # buffer -> (request, candidates, error) of the last completion
+    self._results = {}
+    self._runner = None
+
+  def request(self, buffer, request, args):
+    """
+    candidates of the request, None while they are computed
+    """
+    with self._cond:
+      result = self._results.get(buffer)
+      if result is not None and result[0] == request:
+        del self._results[buffer]
+        if result[2] is not None:
+          raise result[2]
+        return result[1]
+
+      waiting = self._waiting.get(buffer)
+      if self._running.get(buffer) != request and \
+          (waiting is None or waiting[0] != request):
+        self._waiting[buffer] = (request, args)
+        if self._runner is None:
+          self._runner = threading.Thread(target=self._run, daemon=True)
+          self._runner.start()
+        self._cond.notify()
+      return None
+
+  def _run(self):
+    while True:
+      with self._cond:
+        while not self._waiting:
+          self._cond.wait()
+        buffer, (request, args) = self._waiting.popitem()
+        self._running[buffer] = request
+
+      candidates, error = None, None
+      try:
+        candidates = self._complete(*args)
+      except Exception as e:
+        error = e
+
+      with self._cond:
+        del self._running[buffer]
+        # superseded while running, nobody asks for the result anymore
+        if buffer not in self._waiting:
+          self._results[buffer] = (request, candidates, error)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(project, create):
+  """
+  retrieve the engine shared by every source working on the project,
+  the engine is created by calling create on first use
+  """
+  with _engines_lock:
+    if project not in _engines:
+      _engines[project] = create()
+    return _engines[project]
 
 
 class ClangCompletionWrapper(object):
-  def __init__(self, arg_manager):
-    self._completer = clang_completer.ClangCompleter()
+  def __init__(self, arg_manager, engine=None, database=None):
+    self._engine = engine or ClangCompletionEngine()
     self._arg_manager = arg_manager
-    self._runner = None
+    self._database = database
+    # argument managers built from the compilation database, flags -> manager
+    self._arg_managers = {}
+    self._async = AsyncCompletion(self.code_complete)
+
+  def get_arg_manager(self, filepath):
+    """
+    argument manager of the file, built from its compile command when the
+    compilation database lists it, the source default otherwise
+    """
+    flags = self._database.get_flags(filepath) if self._database else None
+    if flags is None:
+      return self._arg_manager
+
+    key = tuple(flags)
+    if key not in self._arg_managers:
+      arg_manager = type(self._arg_manager)()
+      arg_manager.AddArgs(flags)
+      self._arg_managers[key] = arg_manager
+    return self._arg_managers[key]
 
   def update_sync(self, filepath, content):
     """
@@ -34,47 +306,134 @@ class ClangCompletionWrapper(object):
     the completer will add the translation unit
     """
 
-    self._completer.Parse(filepath, content, self._arg_manager)
-    self._completer.Update()
-
-  def process_clang_result(self, result):
-    processed = {
-      'word': '',
-      'kind': '',
-      'menu': '',
-      'info': '',
-      'abbr': '',
-    }
-    completed = ''
-    for pair in result:
-      if pair[0] == 'TypedText':
-        processed['word'] = processed['abbr'] = pair[1]
-      if pair[0] == 'ResultType':
-        processed['menu'] = pair[1]
-      else:
-        completed += pair[1]
-    processed['kind'] = processed['info'] = completed
-    return processed
+    self._engine.parse(filepath, content, self.get_arg_manager(filepath))
+
+  def update_async(self, filepath, content):
+    """
+    schedule a reparse of the translation unit on the background runner
+    edits arriving within the debounce interval are merged into one reparse
+    """
+
+    self._engine.schedule(filepath, content, self.get_arg_manager(filepath))
+
+  def remove_closed(self, loaded):
+    """
+    drop buffers that are no longer loaded in the editor,
+    translation units including them fall back to the files on disk
+    """
+    self._engine.remove_closed(loaded)
 
-  def process_clang_results(self, results):
-    processed = []
-    for result in results:
-      processed.append(self.process_clang_result(result))
-    return processed
+  def stats(self):
+    return self._engine.stats()
 
-  def code_complete(self, filepath, content, line, column):
+  def process_candidates(self, candidates):
+    """
+    turn (word, abbr, menu, info, kind) tuples shaped by the completer
+    into deoplete candidates
+    """
+    return [{'word': word, 'abbr': abbr, 'menu': menu, 'info': info,
+      'kind': kind} for word, abbr, menu, info, kind in candidates]
+
+  def code_complete(self, filepath, content, line, column, prefix='',
+      max_results=0):
     """
     retrive candidate from completer
+    a reparse still waiting for this file is done right away,
+    reparses pending for other files are left to the runner.
+    candidates are matched against prefix and ranked by the completer
+    """
+    arg_manager = self.get_arg_manager(filepath)
+    self._engine.flush(filepath, content, arg_manager)
+    candidates = self._engine.code_complete(filepath, content, line, column,
+      arg_manager, prefix, max_results)
+    return self.process_candidates(candidates)
+
+  def code_complete_async(self, filepath, content, line, column, prefix='',
+      max_results=0):
     """
-    results = self._completer.CodeComplete(filepath, content, line, column,
-      self._arg_manager)
-    return self.process_clang_results(results)
+    retrive candidate computed in background
+    None while the completion is running, a newer request for the file
+    supersedes this one
+    """
+    args = (filepath, content, line, column, prefix, max_results)
+    return self._async.request(filepath, args, args)
 
 
 class ClangDeopleteSourceBase(object):
   def __init__(self, vim):
     self.vim = vim
     self._completer = None
+    self._mirror = BufferMirror(vim)
+    self._max_candidates = 0
+    # candidates are filtered by the typed prefix and capped in the
+    # completer, they have to be gathered again as the input changes
+    self.is_volatile = True
+
+  def get_option(self, name, default=None):
+    """
+    retrieve option shared by all clang sources
+    """
+    return self.vim.vars.get('deoplete#sources#clang#' + name, default)
+
+  def get_cache_directory(self):
+    """
+    directory holding the caches kept across sessions
+    """
+    from include_index import default_cache_directory
+    return os.path.expanduser(self.get_option('cache_directory') or
+      default_cache_directory())
+
+  def create_completer(self, argument_manager):
+    """
+    create completer for the argument manager
+    every source of the project shares one engine
+    """
+    debounce = float(self.get_option('reparse_debounce', 300)) / 1000.0
+    cache_bytes = int(self.get_option('cache_size', 64)) * 1024 * 1024
+    max_translation_units = int(self.get_option('max_translation_units', 16))
+    max_memory = int(self.get_option('max_memory', 2048)) * 1024 * 1024
+    workers = int(self.get_option('workers', 0))
+    worker_max_memory = \
+      int(self.get_option('worker_max_memory', 4096)) * 1024 * 1024
+    self._max_candidates = int(self.get_option('max_candidates', 1000))
+    preamble_bytes = \
+      int(self.get_option('preamble_cache_size', 1024)) * 1024 * 1024
+    preamble_cache = None
+    if preamble_bytes > 0:
+      preamble_cache = (os.path.join(self.get_cache_directory(), 'preamble'),
+        preamble_bytes)
+
+    def create():
+      if workers > 0:
+        from clang_worker import ClangWorkerPool
+        return ClangWorkerPool(workers, worker_max_memory, debounce,
+          cache_bytes, max_translation_units, max_memory, preamble_cache)
+      return ClangCompletionEngine(debounce, cache_bytes,
+        max_translation_units, max_memory, None, preamble_cache)
+
+    engine = get_engine(self.vim.call('getcwd'), create)
+    return ClangCompletionWrapper(argument_manager, engine,
+      self.find_compilation_database())
+
+  def find_compilation_database(self):
+    """
+    compile_commands.json set in the options, or found in the working
+    directory or its build directory
+    """
+    from compilation_database import get_database
+
+    path = self.get_option('compilation_database', '')
+    if path:
+      return get_database(os.path.expanduser(path))
+
+    current_dir = self.vim.call('getcwd')
+    candidates = [os.path.join(current_dir, 'compile_commands.json'),
+      os.path.join(current_dir, 'build', 'compile_commands.json')]
+    for candidate in candidates:
+      if os.path.isfile(candidate):
+        return get_database(candidate)
+    # picked up once it is generated
+    return get_database(candidates[0])
 
   def set_completer(self, completer):
     self._completer = completer
@@ -91,25 +450,46 @@ class ClangDeopleteSourceBase(object):
     """
     return self.vim.eval('expand("%:p")')
 
-  def get_buffer_content(self):
-    return self.vim.eval('join(getline(1, "$"), "\n")')
-    #  return '\n'.join(self.vim.current.buffer)
+  def get_buffer_content(self, bufnr=None):
+    """
+    retrieve buffer content from the mirrored lines
+    """
+    if bufnr is None:
+      bufnr = self.vim.current.buffer.number
+    return self._mirror.content(bufnr)
 
   def search_for_includes(self):
-    current_dir = self.vim.command_output('pwd')
-    includes = glob.glob(current_dir + '/**/include/', recursive=True)
-    includes += glob.glob(current_dir + '/**/src/', recursive=True)
-    includes += glob.glob(current_dir + '/**/build/', recursive=True)
-    return includes
+    from include_index import get_include_index
+
+    index = get_include_index(self.vim.call('getcwd'),
+      self.get_option('include_index_excludes'), self.get_cache_directory())
+    return index.directories()
+
+  def get_loaded_buffers(self):
+    """
+    retrieve full path of every loaded buffer
+    mirrors of the other buffers are dropped
+    """
+    infos = self.vim.call('getbufinfo', {'bufloaded': 1})
+    self._mirror.retain(set(info['bufnr'] for info in infos))
+    return set(info['name'] for info in infos)
 
   def update(self, context):
     """
     update both file content and source object
     """
-    if self._completer:
+    if self._completer and context.get('event') == 'BufUnload':
+      self._completer.remove_closed(self.get_loaded_buffers())
+    elif self._completer and context.get('event') == 'DeopleteCppStats':
+      self.vim.call('DeopleteCppShowStats',
+        format_stats(self._completer.stats()))
+    elif self._completer:
       filepath = self.get_buffer_name()
-      content = self.get_buffer_content()
-      self._completer.update_sync(filepath, content)
+      content = self.get_buffer_content(context.get('bufnr'))
+      if self.get_option('async_reparse', 1):
+        self._completer.update_async(filepath, content)
+      else:
+        self._completer.update_sync(filepath, content)
 
   def get_candidates(self, context):
     """
@@ -119,6 +499,15 @@ class ClangDeopleteSourceBase(object):
       line = self.vim.eval('line(".")')
       col = self.vim.eval('col(".")')
       filepath = self.get_buffer_name()
-      content = self.get_buffer_content()
-      return self._completer.code_complete(filepath, content, line, col)
+      content = self.get_buffer_content(context.get('bufnr'))
+      prefix = context.get('complete_str', '')
+      if not self.get_option('async_completion', 1):
+        return self._completer.code_complete(filepath, content, line, col,
+          prefix, self._max_candidates)
+
+      # deoplete calls again while is_async is set
+      candidates = self._completer.code_complete_async(filepath, content,
+        line, col, prefix, self._max_candidates)
+      context['is_async'] = candidates is None
+      return candidates or []
     return []
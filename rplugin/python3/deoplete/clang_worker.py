@@ -0,0 +1,258 @@
+"""
+run the clang completer in worker processes
+
+the editor talks to every worker through its stdin and stdout,
+each message is a pickled tuple prefixed by its length
+"""
+
+import os
+import sys
+import pickle
+import struct
+import subprocess
+import threading
+import zlib
+
+
+def read_message(stream):
+  header = stream.read(4)
+  if len(header) < 4:
+    raise EOFError('worker pipe closed')
+  size = struct.unpack('>I', header)[0]
+  data = stream.read(size)
+  if len(data) < size:
+    raise EOFError('worker pipe closed')
+  return pickle.loads(data)
+
+
+def write_message(stream, message):
+  data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+  stream.write(struct.pack('>I', len(data)) + data)
+  stream.flush()
+
+
+def resident_memory():
+  """
+  resident memory of the current process in bytes
+  """
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+  except (IOError, OSError, ValueError):
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+class ClangWorkerClient(object):
+  """
+  drop in replacement of ClangCompleter running in a worker process,
+  the worker is restarted when it crashes or uses too much memory
+  """
+
+  def __init__(self, max_rss=0):
+    self._max_rss = max_rss
+    self._process = None
+    self._settings = []
+    self._lock = threading.Lock()
+
+  def Parse(self, filepath, content, arg_manager):
+    self._call('parse', filepath, content, list(arg_manager.args()))
+
+  def Update(self):
+    return self._call('update') or 0
+
+  def CodeCompleteCandidates(self, filepath, content, line, column,
+      arg_manager, prefix='', max_results=0):
+    return self._call('code_complete', filepath, content, line, column,
+      list(arg_manager.args()), prefix, max_results) or []
+
+  def RemoveFile(self, filepath):
+    self._call('remove_file', filepath)
+
+  def files(self):
+    return self._call('files') or []
+
+  def completer_stats(self):
+    return self._call('completer_stats')
+
+  def set_cache_max_bytes(self, max_bytes):
+    self._setting('set_cache_max_bytes', max_bytes)
+
+  def set_max_translation_units(self, max_translation_units):
+    self._setting('set_max_translation_units', max_translation_units)
+
+  def set_max_memory(self, max_memory):
+    self._setting('set_max_memory', max_memory)
+
+  def set_preamble_cache(self, directory, max_bytes):
+    self._setting('set_preamble_cache', directory, max_bytes)
+
+  def close(self):
+    with self._lock:
+      self._stop()
+
+  def _setting(self, method, *args):
+    # replayed whenever the worker is restarted
+    self._settings.append((method, args))
+    self._call(method, *args)
+
+  def _start(self):
+    worker = os.path.realpath(__file__)
+    self._process = subprocess.Popen([sys.executable, worker],
+      stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+      stderr=subprocess.DEVNULL)
+    for method, args in self._settings:
+      self._request(method, args, False)
+
+  def _stop(self):
+    if self._process:
+      try:
+        self._process.kill()
+        self._process.wait()
+      except OSError:
+        pass
+      self._process = None
+
+  def _request(self, method, args, check_memory=True):
+    write_message(self._process.stdin, (method, args))
+    status, result, rss = read_message(self._process.stdout)
+    if check_memory and self._max_rss > 0 and rss > self._max_rss:
+      # start over with a fresh worker on the next request
+      self._stop()
+    if status == 'error':
+      raise RuntimeError(result)
+    return result
+
+  def _call(self, method, *args):
+    with self._lock:
+      # retry once on a fresh worker if the current one died
+      for _ in range(2):
+        if self._process is None:
+          self._start()
+        try:
+          return self._request(method, args)
+        except (EOFError, IOError, OSError, pickle.UnpicklingError):
+          self._stop()
+    return None
+
+
+class ClangWorkerPool(object):
+  """
+  engine sending every file to one of several worker processes,
+  files are sharded by path so different translation units parse in parallel
+  """
+
+  def __init__(self, size, max_rss, debounce=0.3, cache_bytes=None,
+      max_translation_units=0, max_memory=0, preamble_cache=None):
+    from clang_source_base import ClangCompletionEngine
+
+    self._engines = []
+    for _ in range(max(size, 1)):
+      client = ClangWorkerClient(max_rss)
+      self._engines.append(ClangCompletionEngine(debounce, cache_bytes,
+        max_translation_units, max_memory, client, preamble_cache))
+
+  def _engine(self, filepath):
+    shard = zlib.crc32(filepath.encode('utf-8')) % len(self._engines)
+    return self._engines[shard]
+
+  def parse(self, filepath, content, arg_manager):
+    self._engine(filepath).parse(filepath, content, arg_manager)
+
+  def schedule(self, filepath, content, arg_manager):
+    self._engine(filepath).schedule(filepath, content, arg_manager)
+
+  def flush(self, filepath, content, arg_manager):
+    self._engine(filepath).flush(filepath, content, arg_manager)
+
+  def code_complete(self, filepath, content, line, column, arg_manager,
+      prefix='', max_results=0):
+    return self._engine(filepath).code_complete(filepath, content, line,
+      column, arg_manager, prefix, max_results)
+
+  def remove_closed(self, loaded):
+    for engine in self._engines:
+      engine.remove_closed(loaded)
+
+  def stats(self):
+    return [stats for engine in self._engines for stats in engine.stats()]
+
+
+class ClangWorker(object):
+  """
+  serve requests from the editor with a completer in this process
+  """
+
+  def __init__(self, clang_completer):
+    self._clang_completer = clang_completer
+    self._completer = clang_completer.ClangCompleter()
+    self._arg_managers = {}
+
+  def arg_manager(self, args):
+    key = tuple(args)
+    if key not in self._arg_managers:
+      arg_manager = self._clang_completer.ArgumentManager()
+      arg_manager.AddArgs(args)
+      self._arg_managers[key] = arg_manager
+    return self._arg_managers[key]
+
+  def parse(self, filepath, content, args):
+    self._completer.Parse(filepath, content, self.arg_manager(args))
+    self._completer.Update()
+
+  def update(self):
+    return self._completer.Update()
+
+  def code_complete(self, filepath, content, line, column, args, prefix,
+      max_results):
+    return self._completer.CodeCompleteCandidates(filepath, content, line,
+      column, self.arg_manager(args), prefix, max_results)
+
+  def remove_file(self, filepath):
+    self._completer.RemoveFile(filepath)
+
+  def files(self):
+    return list(self._completer.files())
+
+  def completer_stats(self):
+    from clang_source_base import completer_stats
+    return completer_stats(self._completer)
+
+  def set_cache_max_bytes(self, max_bytes):
+    self._completer.set_cache_max_bytes(max_bytes)
+
+  def set_max_translation_units(self, max_translation_units):
+    self._completer.set_max_translation_units(max_translation_units)
+
+  def set_max_memory(self, max_memory):
+    self._completer.set_max_memory(max_memory)
+
+  def set_preamble_cache(self, directory, max_bytes):
+    self._completer.set_preamble_cache(directory, max_bytes)
+
+  def serve(self, reader, writer):
+    while True:
+      try:
+        method, args = read_message(reader)
+      except EOFError:
+        return
+      try:
+        result = getattr(self, method)(*args)
+        write_message(writer, ('ok', result, resident_memory()))
+      except Exception as e:
+        write_message(writer, ('error', str(e), resident_memory()))
+
+
+def main():
+  # keep stdout for messages, anything printed goes to stderr
+  writer = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+  os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+  reader = os.fdopen(os.dup(sys.stdin.fileno()), 'rb')
+
+  from clang_source_base import import_library
+  ClangWorker(import_library()).serve(reader, writer)
+
+
+if __name__ == '__main__':
+  main()
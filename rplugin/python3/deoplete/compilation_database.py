@@ -0,0 +1,142 @@
+"""
+per file compile flags from a compile_commands.json database
+"""
+
+import os
+import json
+import shlex
+import threading
+
+
+# options taking a path, relative paths are resolved against the
+# directory of the compile command. the argument manager drops repeated
+# arguments, so every option is joined with its value
+PATH_OPTIONS = ['-isystem', '-iquote', '-idirafter', '-include', '-imacros',
+  '-isysroot', '-I']
+JOINED_OPTIONS = {'-x': '-x', '-target': '--target='}
+# options that only matter when producing output
+SKIP_OPTIONS = ['-o', '-MF', '-MT', '-MQ']
+SKIP_FLAGS = ['-c', '-M', '-MM', '-MD', '-MMD', '-MP', '-MG']
+
+
+def normalize(path):
+  return os.path.normcase(os.path.abspath(path))
+
+
+def parse_command(entry):
+  """
+  turn a compile command into flags usable by the completer
+  """
+  directory = entry.get('directory', '')
+  if 'arguments' in entry:
+    args = list(entry['arguments'])
+  else:
+    args = shlex.split(entry.get('command', ''))
+  source = os.path.join(directory, entry.get('file', ''))
+
+  flags = []
+  i = 1  # skip the compiler
+  while i < len(args):
+    arg = args[i]
+    i += 1
+    if arg in SKIP_OPTIONS:
+      i += 1
+    elif arg in SKIP_FLAGS or os.path.join(directory, arg) == source:
+      continue
+    elif arg in PATH_OPTIONS:
+      if i < len(args):
+        flags.append(arg + os.path.normpath(os.path.join(directory, args[i])))
+        i += 1
+    elif arg in JOINED_OPTIONS:
+      if i < len(args):
+        flags.append(JOINED_OPTIONS[arg] + args[i])
+        i += 1
+    else:
+      for option in PATH_OPTIONS:
+        if arg.startswith(option) and len(arg) > len(option) and \
+            arg[len(option)] != '-':
+          arg = option + os.path.normpath(
+            os.path.join(directory, arg[len(option):]))
+          break
+      flags.append(arg)
+  return flags
+
+
+class CompilationDatabase(object):
+  """
+  compile_commands.json indexed by source path,
+  reloaded when the file on disk changes
+  """
+
+  def __init__(self, path):
+    self._path = path
+    self._mtime = None
+    self._entries = {}
+    self._directories = {}
+    self._flags = {}
+    self._lock = threading.Lock()
+
+  def _reload(self):
+    try:
+      mtime = os.stat(self._path).st_mtime
+    except OSError:
+      mtime = None
+    if mtime == self._mtime:
+      return
+    self._mtime = mtime
+
+    entries = []
+    if mtime is not None:
+      try:
+        with open(self._path) as f:
+          entries = json.load(f)
+      except (IOError, OSError, ValueError):
+        entries = []
+
+    # flags are parsed lazily, loading only indexes the entries
+    self._entries = {}
+    self._directories = {}
+    self._flags = {}
+    for entry in entries:
+      source = os.path.join(entry.get('directory', ''), entry.get('file', ''))
+      source = normalize(source)
+      self._entries[source] = entry
+      self._directories.setdefault(os.path.dirname(source), source)
+
+  def get_flags(self, filepath):
+    """
+    flags of the file, files not in the database (headers) use the flags
+    of a source in the same directory, None when nothing matches
+    """
+    with self._lock:
+      self._reload()
+
+      source = normalize(filepath)
+      if source not in self._entries:
+        source = self._directories.get(os.path.dirname(source))
+        if source is None:
+          return None
+
+      if source not in self._flags:
+        self._flags[source] = parse_command(self._entries[source])
+      return self._flags[source]
+
+  def __len__(self):
+    with self._lock:
+      self._reload()
+      return len(self._entries)
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(path):
+  """
+  retrieve the database shared by every source
+  """
+  path = os.path.realpath(path)
+  with _databases_lock:
+    if path not in _databases:
+      _databases[path] = CompilationDatabase(path)
+    return _databases[path]
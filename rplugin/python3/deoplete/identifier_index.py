@@ -0,0 +1,104 @@
+"""
+identifiers of the open buffers
+
+the identifiers of every line are kept with the number of times each
+identifier occurs, an edit only rescans the lines it replaced
+"""
+
+import re
+
+
+IDENTIFIER = re.compile(r'[^\W\d]\w*')
+
+
+class BufferIdentifiers(object):
+  def __init__(self):
+    # identifiers of each line
+    self._lines = []
+    # identifier -> occurrences in the buffer
+    self.counts = {}
+    # identifier -> clock of the edit which added it last
+    self.recency = {}
+
+  def replace(self, first, last, lines, clock):
+    if last is None:
+      last = len(self._lines)
+
+    counts = self.counts
+    for words in self._lines[first:last]:
+      for word in words:
+        count = counts[word] - 1
+        if count:
+          counts[word] = count
+        else:
+          del counts[word]
+          del self.recency[word]
+
+    scanned = [IDENTIFIER.findall(line) for line in lines]
+    recency = self.recency
+    for words in scanned:
+      for word in words:
+        counts[word] = counts.get(word, 0) + 1
+        recency[word] = clock
+    self._lines[first:last] = scanned
+
+
+class IdentifierIndex(object):
+  """
+  identifiers of every buffer ranked by the edit which added them last,
+  then by their occurrences, at most max_identifiers are kept
+  """
+
+  def __init__(self, max_identifiers=10000):
+    self._max_identifiers = max_identifiers
+    # bufnr -> BufferIdentifiers
+    self._buffers = {}
+    self._clock = 0
+    self._ranked = None
+
+  def set_max_identifiers(self, max_identifiers):
+    self._max_identifiers = max_identifiers
+    self._ranked = None
+
+  def replace(self, bufnr, first, last, lines):
+    """
+    lines[first:last] of the buffer were replaced,
+    last is None when every line was replaced
+    """
+    buffer = self._buffers.get(bufnr)
+    if buffer is None:
+      buffer = BufferIdentifiers()
+      self._buffers[bufnr] = buffer
+    self._clock += 1
+    buffer.replace(first, last, lines, self._clock)
+    self._ranked = None
+
+  def retain(self, bufnrs):
+    """
+    forget buffers which are not listed
+    """
+    for bufnr in list(self._buffers):
+      if bufnr not in bufnrs:
+        del self._buffers[bufnr]
+        self._ranked = None
+
+  def identifiers(self):
+    """
+    ranked identifiers, the ranking is kept until a buffer changes
+    """
+    if self._ranked is None:
+      counts = {}
+      recency = {}
+      for buffer in self._buffers.values():
+        for word, count in buffer.counts.items():
+          counts[word] = counts.get(word, 0) + count
+        for word, clock in buffer.recency.items():
+          if clock > recency.get(word, 0):
+            recency[word] = clock
+
+      ranked = sorted(counts,
+        key=lambda word: (recency[word], counts[word]), reverse=True)
+      if self._max_identifiers > 0:
+        del ranked[self._max_identifiers:]
+      self._ranked = ranked
+    return self._ranked
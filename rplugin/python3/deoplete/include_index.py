@@ -0,0 +1,159 @@
+"""
+index of include directories under a project root
+
+the directory tree is kept on disk per project, a directory is only listed
+again when its mtime changed, so revalidation costs one stat per directory
+"""
+
+import os
+import json
+import fnmatch
+import hashlib
+import threading
+
+
+INCLUDE_NAMES = ['include', 'src', 'build']
+# reported but not descended into, build trees are large and generated
+LEAF_NAMES = ['build']
+DEFAULT_EXCLUDES = ['.*', 'node_modules', '__pycache__', 'CMakeFiles',
+  'bazel-*']
+
+
+def default_cache_directory():
+  cache_home = os.environ.get('XDG_CACHE_HOME',
+    os.path.join(os.path.expanduser('~'), '.cache'))
+  return os.path.join(cache_home, 'deoplete-cpp')
+
+
+class IncludeIndex(object):
+  def __init__(self, root, excludes=None, cache_directory=None):
+    self._root = os.path.realpath(root)
+    self._excludes = list(DEFAULT_EXCLUDES if excludes is None else excludes)
+    cache_directory = os.path.expanduser(
+      cache_directory or default_cache_directory())
+    key = hashlib.sha1(self._root.encode('utf-8')).hexdigest()
+    self._path = os.path.join(cache_directory, 'include_index', key + '.json')
+
+    # directory -> (mtime, subdirectories)
+    self._tree = None
+    self._directories = []
+    self._lock = threading.Lock()
+    self._runner = None
+
+  def _excluded(self, name):
+    for pattern in self._excludes:
+      if fnmatch.fnmatch(name, pattern):
+        return True
+    return False
+
+  def _load(self):
+    try:
+      with open(self._path) as f:
+        data = json.load(f)
+      if data.get('excludes') == self._excludes:
+        return dict((d, tuple(v)) for d, v in data['tree'].items())
+    except (IOError, OSError, ValueError, KeyError, AttributeError):
+      pass
+    return None
+
+  def _save(self, tree):
+    try:
+      os.makedirs(os.path.dirname(self._path), exist_ok=True)
+      temp = self._path + '.tmp'
+      with open(temp, 'w') as f:
+        json.dump({'excludes': self._excludes, 'tree': tree}, f)
+      os.replace(temp, self._path)
+    except (IOError, OSError):
+      pass
+
+  def _scan(self, old_tree):
+    tree = {}
+    directories = []
+    stack = [self._root]
+    while stack:
+      directory = stack.pop()
+      try:
+        mtime = os.stat(directory).st_mtime
+      except OSError:
+        continue
+
+      cached = old_tree.get(directory)
+      if cached and cached[0] == mtime:
+        subdirectories = cached[1]
+      else:
+        subdirectories = []
+        try:
+          for entry in os.scandir(directory):
+            if entry.is_dir(follow_symlinks=False) and \
+                not self._excluded(entry.name):
+              subdirectories.append(entry.name)
+        except OSError:
+          pass
+      tree[directory] = (mtime, subdirectories)
+
+      for name in subdirectories:
+        path = os.path.join(directory, name)
+        if name in INCLUDE_NAMES:
+          directories.append(path + os.sep)
+        if name not in LEAF_NAMES:
+          stack.append(path)
+    return tree, sorted(directories)
+
+  def _collect(self, tree):
+    directories = []
+    for directory, (_, subdirectories) in tree.items():
+      for name in subdirectories:
+        if name in INCLUDE_NAMES:
+          directories.append(os.path.join(directory, name) + os.sep)
+    return sorted(directories)
+
+  def revalidate(self):
+    """
+    bring the index up to date with the directories on disk
+    """
+    with self._lock:
+      old_tree = self._tree if self._tree is not None else \
+        (self._load() or {})
+    tree, directories = self._scan(old_tree)
+    with self._lock:
+      changed = tree != old_tree
+      self._tree = tree
+      self._directories = directories
+    if changed:
+      self._save(tree)
+
+  def directories(self):
+    """
+    include directories of the project, an index stored on disk is used
+    right away and revalidated in the background
+    """
+    with self._lock:
+      if self._tree is None:
+        tree = self._load()
+        if tree is not None:
+          self._tree = tree
+          self._directories = self._collect(tree)
+          self._runner = threading.Thread(target=self.revalidate, daemon=True)
+          self._runner.start()
+      if self._tree is not None:
+        return list(self._directories)
+
+    self.revalidate()
+    with self._lock:
+      return list(self._directories)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_include_index(root, excludes=None, cache_directory=None):
+  """
+  retrieve the index shared by every source
+  """
+  key = (os.path.realpath(root),
+    None if excludes is None else tuple(excludes), cache_directory)
+  with _indexes_lock:
+    if key not in _indexes:
+      _indexes[key] = IncludeIndex(root, excludes, cache_directory)
+    return _indexes[key]
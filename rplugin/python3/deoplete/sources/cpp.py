@@ -100,7 +100,7 @@ class Source(Base, ClangDeopleteSourceBase):
 
   def on_init(self, context):
     argument_manager = self.setup_arg_manager(self.vim)
-    completer = ClangCompletionWrapper(argument_manager)
+    completer = self.create_completer(argument_manager)
     self.set_completer(completer)
 
   def on_event(self, context):
@@ -1,6 +1,19 @@
-import re
+import os
+import sys
+
 from .base import Base
 
+
+try:
+  current = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  sys.path.insert(0, current)
+
+  from buffer_mirror import BufferMirror
+  from identifier_index import IdentifierIndex
+except Exception:
+  pass
+
+
 class Source(Base):
   def __init__(self, vim):
     Base.__init__(self, vim)
@@ -9,17 +22,34 @@ class Source(Base):
     self.mark = '[ID]'
     self.rank = 100
     self.debug_enabled = False
-    self._cache = []
 
-    self._gather_identifier()
+    # lines changed in the mirror are rescanned by the index
+    self._index = IdentifierIndex()
+    self._mirror = BufferMirror(vim, self._index.replace)
+    self._identifiers = None
+    self._candidates = []
+
+  def _update(self, context):
+    bufnr = context.get('bufnr') or self.vim.current.buffer.number
+    self._mirror.sync(bufnr)
 
-  def _gather_identifier(self):
-    for w in re.findall(r'[\w\d]+', '\n'.join(self.vim.current.buffer)):
-      if w not in self._cache:
-        self._cache.append(w)
+  def on_init(self, context):
+    self._index.set_max_identifiers(int(self.vim.vars.get(
+      'deoplete#sources#identifier#max_identifiers', 10000)))
+    self._update(context)
 
   def on_event(self, context):
-    self._gather_identifier()
+    infos = self.vim.call('getbufinfo', {'bufloaded': 1})
+    bufnrs = set(info['bufnr'] for info in infos)
+    self._mirror.retain(bufnrs)
+    self._index.retain(bufnrs)
+    self._update(context)
 
   def gather_candidates(self, context):
-    return [{'word': w, 'kind': 'identifier'} for w in self._cache]
+    self._update(context)
+    identifiers = self._index.identifiers()
+    if identifiers is not self._identifiers:
+      self._identifiers = identifiers
+      self._candidates = [{'word': w, 'kind': 'identifier'}
+        for w in identifiers]
+    return self._candidates
@@ -52,3 +52,12 @@ void ArgumentManager::PrepareArgs(std::vector<char*>& args) const {
     args.push_back(const_cast<char*>(args_[i].c_str()));
   }
 }
+
+size_t ArgumentManager::Hash() const {
+  std::string profile;
+  for (int i = 0; i < args_.size(); ++i) {
+    profile += args_[i];
+    profile += '\0';
+  }
+  return std::hash<std::string>()(profile);
+}
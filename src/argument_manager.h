@@ -4,6 +4,7 @@
 #include <string>
 #include <vector>
 #include <algorithm>
+#include <functional>
 #include <sstream>
 
 class ArgumentManager {
@@ -17,6 +18,7 @@ class ArgumentManager {
   bool AddDefinition(const std::string& def);
   void AddDefinitions(const std::vector<std::string>& defs);
   void PrepareArgs(std::vector<char*>& args) const;
+  size_t Hash() const;
 
   std::vector<std::string> args() const { return args_; }
 
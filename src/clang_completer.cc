@@ -1,8 +1,49 @@
 #include "clang_completer.h"
 
+#include <chrono>
+#include <climits>
+
+#include "fuzzy_match.h"
+
+namespace {
+
+double MillisecondsSince(std::chrono::steady_clock::time_point start) {
+  std::chrono::duration<double, std::milli> elapsed =
+      std::chrono::steady_clock::now() - start;
+  return elapsed.count();
+}
+
+void InclusionVisitor(CXFile included_file, CXSourceLocation*, unsigned,
+                      CXClientData client_data) {
+  std::set<std::string>* inclusions =
+      static_cast<std::set<std::string>*>(client_data);
+  CXString filename = clang_getFileName(included_file);
+  const char* name = clang_getCString(filename);
+  if (name) {
+    inclusions->insert(NormalizePath(name));
+  }
+  clang_disposeString(filename);
+}
+
+size_t ResourceUsage(CXTranslationUnit trans_unit) {
+  CXTUResourceUsage usage = clang_getCXTUResourceUsage(trans_unit);
+  size_t bytes = 0;
+  for (unsigned i = 0; i < usage.numEntries; ++i) {
+    bytes += usage.entries[i].amount;
+  }
+  clang_disposeCXTUResourceUsage(usage);
+  return bytes;
+}
+
+}  // namespace
+
 // excludeDeclarationsFromPCH: allows enumeration of "local" declarations (when
 // loading any new translation units)
-ClangCompleter::ClangCompleter() : index_(clang_createIndex(1, 1)) {
+ClangCompleter::ClangCompleter()
+    : index_(clang_createIndex(1, 1)),
+      max_translation_units_(0),
+      max_memory_(0),
+      reparse_count_(0) {
   parse_option_ = CXTranslationUnit_DetailedPreprocessingRecord |
                   CXTranslationUnit_Incomplete |
                   CXTranslationUnit_PrecompiledPreamble |
@@ -17,46 +58,228 @@ ClangCompleter::ClangCompleter() : index_(clang_createIndex(1, 1)) {
 
 ClangCompleter::~ClangCompleter() {
   for (auto it = trans_units_.begin(); it != trans_units_.end(); ++it) {
-    clang_disposeTranslationUnit(it->second);
+    clang_disposeTranslationUnit(it->second.unit);
   }
   clang_disposeIndex(index_);
 }
 
 void ClangCompleter::Parse(const std::string& file, const std::string& content,
                            const ArgumentManager& arg_manager) {
-  std::vector<CXUnsavedFile> unsaved_files =
-      content_.GetUnsavedFiles(file, content);
+  content_.insert(file, content);
 
-  if (trans_units_.find(file) != trans_units_.end()) {
+  std::string key = UnitKey(file, arg_manager);
+  auto found = trans_units_.find(key);
+  if (found != trans_units_.end()) {
     // already added
-    CXTranslationUnit trans_unit = trans_units_[file];
-    clang_reparseTranslationUnit(trans_unit, unsaved_files.size(),
-                                 &unsaved_files[0],
-                                 clang_defaultReparseOptions(trans_unit));
-
-    cache_.clear();
-    trans_units_[file] = trans_unit;
+    Visit(key);
+    if (!IsDirty(found->second)) {
+      // nothing changed since the last parse
+      return;
+    }
+    Reparse(key, found->second);
   } else {
     // add translation unit
+    // inclusions are not known yet, so every open buffer is passed
+    std::vector<CXUnsavedFile> unsaved_files = content_.GetUnsavedFiles();
     std::vector<char*> args;
     arg_manager.PrepareArgs(args);
+    std::vector<std::string> open_files;
+    std::vector<std::string> buffers = content_.files();
+    for (int i = 0; i < buffers.size(); ++i) {
+      open_files.push_back(content_.path(buffers[i]));
+    }
+    std::string preamble = preamble_cache_.Get(index_, content,
+                                               arg_manager.args(), open_files);
+    if (!preamble.empty()) {
+      args.push_back(const_cast<char*>("-include-pch"));
+      args.push_back(const_cast<char*>(preamble.c_str()));
+    }
 
-    CXTranslationUnit tu = clang_parseTranslationUnit(
-        index_, file.c_str(), &args[0], args.size(), &unsaved_files[0],
+    TranslationUnit& tu = trans_units_[key];
+    tu.file = file;
+    auto start = std::chrono::steady_clock::now();
+    tu.unit = clang_parseTranslationUnit(
+        index_, file.c_str(), &args[0], args.size(), unsaved_files.data(),
         unsaved_files.size(), parse_option_);
-    trans_units_[file] = tu;
+    RecordParse(tu, MillisecondsSince(start), false);
+    tu.parsed_revision = content_.revision();
+    tu.generation = 0;
+    tu.memory_usage = ResourceUsage(tu.unit);
+    RecordInclusions(tu);
+    Visit(key);
+  }
+  Trim();
+}
+
+int ClangCompleter::Update() {
+  // only reparse the units including a modified file
+  int skipped = 0;
+  for (auto it = trans_units_.begin(); it != trans_units_.end(); ++it) {
+    if (!IsDirty(it->second)) {
+      ++skipped;
+      continue;
+    }
+    Reparse(it->first, it->second);
   }
+  Trim();
+  return skipped;
 }
 
-void ClangCompleter::Update() {
-  std::vector<CXUnsavedFile> unsaved_files = content_.GetUnsavedFiles();
+void ClangCompleter::RemoveFile(const std::string& file) {
+  content_.remove(file);
+
+  // units including the buffer go back to the copy saved on disk
+  std::string path = NormalizePath(file);
+  std::vector<std::string> disposed;
   for (auto it = trans_units_.begin(); it != trans_units_.end(); ++it) {
-    clang_reparseTranslationUnit(it->second, unsaved_files.size(),
-                                 &unsaved_files[0],
-                                 clang_defaultReparseOptions(it->second));
+    if (it->second.file == file) {
+      disposed.push_back(it->first);
+    } else if (it->second.inclusions.count(path)) {
+      it->second.parsed_revision = -1;
+    }
+  }
+
+  for (int i = 0; i < disposed.size(); ++i) {
+    DisposeTranslationUnit(disposed[i]);
+  }
+}
+
+void ClangCompleter::set_max_translation_units(int max_translation_units) {
+  max_translation_units_ = max_translation_units;
+  Trim();
+}
+
+void ClangCompleter::set_max_memory(size_t max_memory) {
+  max_memory_ = max_memory;
+  Trim();
+}
+
+std::vector<TranslationUnitStats> ClangCompleter::stats() const {
+  std::vector<TranslationUnitStats> stats;
+  for (auto it = trans_units_.begin(); it != trans_units_.end(); ++it) {
+    const TranslationUnit& tu = it->second;
+    int parses = tu.parse_count + tu.reparse_count;
+    stats.push_back(TranslationUnitStats{
+        tu.file, it->first, tu.parse_count, tu.reparse_count, tu.parse_time,
+        parses ? tu.total_parse_time / parses : 0.0, tu.complete_count,
+        tu.complete_time,
+        tu.complete_count ? tu.total_complete_time / tu.complete_count : 0.0,
+        tu.result_count, tu.memory_usage});
+  }
+  return stats;
+}
+
+size_t ClangCompleter::memory_usage() const {
+  size_t bytes = 0;
+  for (auto it = trans_units_.begin(); it != trans_units_.end(); ++it) {
+    bytes += it->second.memory_usage;
+  }
+  return bytes;
+}
+
+std::string ClangCompleter::UnitKey(const std::string& file,
+                                    const ArgumentManager& arg_manager) const {
+  std::stringstream ss;
+  ss << file << "@" << std::hex << arg_manager.Hash();
+  return ss.str();
+}
+
+int ClangCompleter::Generation(const std::string& key) const {
+  auto found = trans_units_.find(key);
+  if (found != trans_units_.end()) {
+    return found->second.generation;
   }
+  return 0;
+}
+
+std::vector<CXUnsavedFile> ClangCompleter::GetUnsavedFiles(
+    const TranslationUnit& tu) const {
+  return content_.GetRelevantUnsavedFiles(tu.file, tu.inclusions);
+}
+
+void ClangCompleter::Reparse(const std::string& key, TranslationUnit& tu) {
+  std::vector<CXUnsavedFile> unsaved_files = GetUnsavedFiles(tu);
+  auto start = std::chrono::steady_clock::now();
+  clang_reparseTranslationUnit(tu.unit, unsaved_files.size(),
+                               unsaved_files.data(),
+                               clang_defaultReparseOptions(tu.unit));
+  RecordParse(tu, MillisecondsSince(start), true);
+  Reparsed(key, tu);
+
+  if (GetUnsavedFiles(tu).size() > unsaved_files.size()) {
+    // the unit started including another open buffer
+    Reparse(key, tu);
+  }
+}
+
+bool ClangCompleter::IsDirty(const TranslationUnit& tu) const {
+  // a unit is dirty when the file itself or any file it includes changed
+  // after it was last parsed
+  const std::map<std::string, int>& revisions = content_.revisions();
+  for (auto it = revisions.begin(); it != revisions.end(); ++it) {
+    if (it->second <= tu.parsed_revision) {
+      continue;
+    }
+    if (it->first == tu.file) {
+      return true;
+    }
+    if (tu.inclusions.count(content_.path(it->first))) {
+      return true;
+    }
+  }
+  return tu.parsed_revision < 0;
+}
+
+void ClangCompleter::RecordParse(TranslationUnit& tu, double milliseconds,
+                                 bool reparse) {
+  if (reparse) {
+    ++tu.reparse_count;
+  } else {
+    ++tu.parse_count;
+  }
+  tu.parse_time = milliseconds;
+  tu.total_parse_time += milliseconds;
+}
+
+void ClangCompleter::Reparsed(const std::string& key, TranslationUnit& tu) {
+  tu.parsed_revision = content_.revision();
+  tu.memory_usage = ResourceUsage(tu.unit);
+  RecordInclusions(tu);
+  ++reparse_count_;
+
+  // results cached for an older generation of this unit are stale
+  cache_.RemoveStale(key, ++tu.generation);
+}
+
+void ClangCompleter::RecordInclusions(TranslationUnit& tu) {
+  tu.inclusions.clear();
+  clang_getInclusions(tu.unit, InclusionVisitor, &tu.inclusions);
+}
+
+void ClangCompleter::Visit(const std::string& key) {
+  visits_.remove(key);
+  visits_.push_front(key);
+}
 
-  cache_.clear();
+void ClangCompleter::Trim() {
+  // dispose least recently visited units, but always keep the current one,
+  // a disposed unit is parsed again the next time its file is visited
+  while (visits_.size() > 1) {
+    bool too_many = max_translation_units_ > 0 &&
+                    trans_units_.size() > max_translation_units_;
+    bool too_large = max_memory_ > 0 && memory_usage() > max_memory_;
+    if (!too_many && !too_large) {
+      break;
+    }
+    DisposeTranslationUnit(visits_.back());
+  }
+}
+
+void ClangCompleter::DisposeTranslationUnit(const std::string& key) {
+  clang_disposeTranslationUnit(trans_units_[key].unit);
+  trans_units_.erase(key);
+  visits_.remove(key);
+  cache_.RemoveStale(key, INT_MAX);
 }
 
 CompletionResults ClangCompleter::ObtainCodeCompleteResult(
@@ -64,38 +287,84 @@ CompletionResults ClangCompleter::ObtainCodeCompleteResult(
     const ArgumentManager& arg_manager) {
   Parse(file, content, arg_manager);
 
-  CXTranslationUnit trans_unit = trans_units_[file];
-  std::vector<CXUnsavedFile> unsaved_files =
-      content_.GetUnsavedFiles(file, content);
+  TranslationUnit& tu = trans_units_[UnitKey(file, arg_manager)];
+  std::vector<CXUnsavedFile> unsaved_files = GetUnsavedFiles(tu);
+  auto start = std::chrono::steady_clock::now();
   CXCodeCompleteResults* results = clang_codeCompleteAt(
-      trans_unit, file.c_str(), line, column, &unsaved_files[0],
+      tu.unit, file.c_str(), line, column, unsaved_files.data(),
       unsaved_files.size(), complete_option_);
 
   std::vector<CompletionResult> outputs;
   if (results) {
+    // alphabetical, then by priority, so that ties in ranking keep the
+    // more likely results first
     clang_sortCodeCompletionResults(results->Results, results->NumResults);
-
+    std::vector<std::pair<unsigned, int>> order;
+    order.reserve(results->NumResults);
     for (int i = 0; i < results->NumResults; ++i) {
       CXCompletionString cs = results->Results[i].CompletionString;
-      CompletionResult result = ParseResult(cs);
-      outputs.push_back(result);
+      order.push_back(std::make_pair(clang_getCompletionPriority(cs), i));
+    }
+    std::stable_sort(order.begin(), order.end());
+
+    outputs.reserve(order.size());
+    for (int i = 0; i < order.size(); ++i) {
+      CXCompletionString cs = results->Results[order[i].second].CompletionString;
+      outputs.push_back(ParseResult(cs));
     }
     clang_disposeCodeCompleteResults(results);
   }
 
+  tu.complete_time = MillisecondsSince(start);
+  tu.total_complete_time += tu.complete_time;
+  ++tu.complete_count;
+  tu.result_count = outputs.size();
   return outputs;
 }
 
 CompletionResults ClangCompleter::CodeComplete(
     const std::string& file, const std::string& content, int line, int column,
-    const ArgumentManager& arg_manager) {
+    const ArgumentManager& arg_manager, const std::string& prefix,
+    int max_results) {
+  std::string key = UnitKey(file, arg_manager);
   std::string token = FindToken(content, line, column);
-  if (cache_.has_cache(token)) {
-    return cache_[token];
-  } else {
-    std::vector<CompletionResult> results =
+  CompletionResults obtained;
+  const CompletionResults* results = cache_.Find(key, token, Generation(key));
+  if (!results) {
+    obtained =
         ObtainCodeCompleteResult(file, content, line, column, arg_manager);
-    cache_[token] = results;
-    return results;
+    cache_.Insert(key, token, Generation(key), obtained);
+    results = &obtained;
+  }
+  if (prefix.empty() && max_results <= 0) {
+    return *results;
+  }
+
+  std::vector<std::string> words;
+  words.reserve(results->size());
+  for (int i = 0; i < results->size(); ++i) {
+    words.push_back(TypedText((*results)[i]));
+  }
+  std::vector<int> ranked = RankWords(words, prefix, max_results);
+
+  CompletionResults filtered;
+  filtered.reserve(ranked.size());
+  for (int i = 0; i < ranked.size(); ++i) {
+    filtered.push_back((*results)[ranked[i]]);
+  }
+  return filtered;
+}
+
+CompletionCandidates ClangCompleter::CodeCompleteCandidates(
+    const std::string& file, const std::string& content, int line, int column,
+    const ArgumentManager& arg_manager, const std::string& prefix,
+    int max_results) {
+  CompletionResults results = CodeComplete(file, content, line, column,
+                                           arg_manager, prefix, max_results);
+  CompletionCandidates candidates;
+  candidates.reserve(results.size());
+  for (int i = 0; i < results.size(); ++i) {
+    candidates.push_back(MakeCandidate(results[i]));
   }
+  return candidates;
 }
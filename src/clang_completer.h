@@ -1,7 +1,9 @@
 #include <algorithm>
 #include <fstream>
 #include <iostream>
+#include <list>
 #include <map>
+#include <set>
 #include <sstream>
 #include <string>
 #include <utility>
@@ -13,8 +15,45 @@
 #include "completion_cache.h"
 #include "completion_result.h"
 #include "file_content.h"
+#include "preamble_cache.h"
 #include "token.h"
 
+// state of a translation unit parsed for one file and argument profile
+struct TranslationUnit {
+  std::string file;
+  CXTranslationUnit unit;
+  int parsed_revision;
+  int generation;
+  size_t memory_usage;
+  // files included, directly or transitively
+  std::set<std::string> inclusions;
+
+  // statistics, times in milliseconds
+  int parse_count;
+  int reparse_count;
+  double parse_time;
+  double total_parse_time;
+  int complete_count;
+  double complete_time;
+  double total_complete_time;
+  size_t result_count;
+};
+
+// statistics of a translation unit reported by ClangCompleter::stats
+struct TranslationUnitStats {
+  std::string file;
+  std::string key;
+  int parses;
+  int reparses;
+  double last_parse_ms;
+  double average_parse_ms;
+  int completions;
+  double last_complete_ms;
+  double average_complete_ms;
+  size_t results;
+  size_t memory_usage;
+};
+
 class ClangCompleter {
  public:
   ClangCompleter();
@@ -22,23 +61,78 @@ class ClangCompleter {
 
   void Parse(const std::string& file, const std::string& content,
              const ArgumentManager& arg_manager);
-  void Update();
+  int Update();
+  void RemoveFile(const std::string& file);
   CompletionResults ObtainCodeCompleteResult(
       const std::string& file, const std::string& content, int line, int column,
       const ArgumentManager& arg_manager);
+  // results matching prefix, best first and at most max_results of them
+  // when it is positive
   CompletionResults CodeComplete(const std::string& file,
                                  const std::string& content, int line,
-                                 int column,
-                                 const ArgumentManager& arg_manager);
+                                 int column, const ArgumentManager& arg_manager,
+                                 const std::string& prefix = "",
+                                 int max_results = 0);
+  CompletionCandidates CodeCompleteCandidates(
+      const std::string& file, const std::string& content, int line, int column,
+      const ArgumentManager& arg_manager, const std::string& prefix = "",
+      int max_results = 0);
 
   int file_count() const { return content_.file_count(); }
+  std::vector<std::string> files() const { return content_.files(); }
+  int reparse_count() const { return reparse_count_; }
+
+  void set_cache_max_bytes(size_t max_bytes) {
+    cache_.set_max_bytes(max_bytes);
+  }
+  size_t cache_max_bytes() const { return cache_.max_bytes(); }
+  size_t cache_bytes() const { return cache_.bytes(); }
+  size_t cache_hits() const { return cache_.hits(); }
+  size_t cache_misses() const { return cache_.misses(); }
+  size_t cache_evictions() const { return cache_.evictions(); }
+
+  // 0 means unlimited
+  void set_max_translation_units(int max_translation_units);
+  void set_max_memory(size_t max_memory);
+  int translation_unit_count() const { return trans_units_.size(); }
+  size_t memory_usage() const;
+  std::vector<TranslationUnitStats> stats() const;
+  size_t unsaved_bytes() const { return content_.bytes(); }
+
+  // an empty directory disables the precompiled preamble cache
+  void set_preamble_cache(const std::string& directory, size_t max_bytes) {
+    preamble_cache_.set_directory(directory);
+    preamble_cache_.set_max_bytes(max_bytes);
+  }
+  size_t preamble_cache_hits() const { return preamble_cache_.hits(); }
+  size_t preamble_cache_builds() const { return preamble_cache_.builds(); }
 
  private:
+  std::string UnitKey(const std::string& file,
+                      const ArgumentManager& arg_manager) const;
+  int Generation(const std::string& key) const;
+  std::vector<CXUnsavedFile> GetUnsavedFiles(const TranslationUnit& tu) const;
+  void Reparse(const std::string& key, TranslationUnit& tu);
+  void RecordParse(TranslationUnit& tu, double milliseconds, bool reparse);
+  bool IsDirty(const TranslationUnit& tu) const;
+  void Reparsed(const std::string& key, TranslationUnit& tu);
+  void RecordInclusions(TranslationUnit& tu);
+  void Visit(const std::string& key);
+  void Trim();
+  void DisposeTranslationUnit(const std::string& key);
+
   CXIndex index_;
   int parse_option_;
   int complete_option_;
 
-  std::map<std::string, CXTranslationUnit> trans_units_;
+  // translation units keyed by file and argument profile
+  std::map<std::string, TranslationUnit> trans_units_;
+  // most recently visited units first
+  std::list<std::string> visits_;
+  int max_translation_units_;
+  size_t max_memory_;
+  int reparse_count_;
   FileContent content_;
   CompletionCache cache_;
+  PreambleCache preamble_cache_;
 };
@@ -1,12 +1,14 @@
-%module clang_completer
+%module(threads="1") clang_completer
 
 %include "std_string.i"
 %include "std_vector.i"
 %include "std_pair.i"
+%include "typemaps.i"
 
 %{
 #include "clang_completer.h"
 #include "completion_result.h"
+#include "token.h"
 #include "argument_manager.h"
 #include "c_argument_manager.h"
 #include "cpp_argument_manager.h"
@@ -18,6 +20,40 @@ typedef std::pair<std::string, std::string> CompletionResultData;
 typedef std::vector<CompletionResultData> CompletionResult;
 typedef std::vector<CompletionResult> CompletionResults;
 
+// candidates are returned as a list of (word, abbr, menu, info, kind)
+// tuples, they are shaped in C++ while the GIL is released
+%typemap(out) CompletionCandidates {
+  const CompletionCandidates& candidates = $1;
+  $result = PyList_New(candidates.size());
+  for (size_t i = 0; i < candidates.size(); ++i) {
+    const CompletionCandidate& candidate = candidates[i];
+    const std::string* fields[] = {&candidate.word, &candidate.abbr,
+                                   &candidate.menu, &candidate.info,
+                                   &candidate.kind};
+    PyObject* item = PyTuple_New(5);
+    for (int j = 0; j < 5; ++j) {
+      PyTuple_SET_ITEM(item, j, PyUnicode_DecodeUTF8(fields[j]->data(),
+                                                     fields[j]->size(),
+                                                     "replace"));
+    }
+    PyList_SET_ITEM($result, i, item);
+  }
+}
+
+struct TranslationUnitStats {
+  std::string file;
+  std::string key;
+  int parses;
+  int reparses;
+  double last_parse_ms;
+  double average_parse_ms;
+  int completions;
+  double last_complete_ms;
+  double average_complete_ms;
+  size_t results;
+  size_t memory_usage;
+};
+
 class ClangCompleter {
  public:
   ClangCompleter();
@@ -25,18 +61,50 @@ class ClangCompleter {
 
   void Parse(const std::string& file, const std::string& content,
              const ArgumentManager& arg_manager);
-  void Update();
+  int Update();
+  void RemoveFile(const std::string& file);
   CompletionResults CodeComplete(const std::string& file,
                                    const std::string& content, int line,
-                                   int column, const ArgumentManager& arg_manager);
+                                   int column, const ArgumentManager& arg_manager,
+                                   const std::string& prefix = "",
+                                   int max_results = 0);
+  CompletionCandidates CodeCompleteCandidates(
+      const std::string& file, const std::string& content, int line,
+      int column, const ArgumentManager& arg_manager,
+      const std::string& prefix = "", int max_results = 0);
 
   int file_count() const;
+  std::vector<std::string> files() const;
+  int reparse_count() const;
+
+  void set_cache_max_bytes(size_t max_bytes);
+  size_t cache_max_bytes() const;
+  size_t cache_bytes() const;
+  size_t cache_hits() const;
+  size_t cache_misses() const;
+  size_t cache_evictions() const;
+
+  void set_max_translation_units(int max_translation_units);
+  void set_max_memory(size_t max_memory);
+  int translation_unit_count() const;
+  size_t memory_usage() const;
+  std::vector<TranslationUnitStats> stats() const;
+  size_t unsaved_bytes() const;
+
+  void set_preamble_cache(const std::string& directory, size_t max_bytes);
+  size_t preamble_cache_hits() const;
+  size_t preamble_cache_builds() const;
 };
 
+%template(StringVector) std::vector<std::string>;
+%template(TranslationUnitStatsVector) std::vector<TranslationUnitStats>;
 %template(CompletionResultData) std::pair<std::string, std::string>;
 %template(CompletionResult) std::vector<std::pair<std::string, std::string>>;
 %template(CompletionResults) std::vector<std::vector<std::pair<std::string, std::string>>>;
 
+// returns (token, line, column)
+std::string FindToken(const std::string& content, int& INOUT, int& INOUT);
+
 class ArgumentManager {
  public:
   ArgumentManager();
@@ -48,6 +116,7 @@ class ArgumentManager {
   bool AddDefinition(const std::string& def);
   void AddDefinitions(const std::vector<std::string>& defs);
   void PrepareArgs(std::vector<char*>& args) const;
+  size_t Hash() const;
 
   std::vector<std::string> args() const { return args_; }
 };
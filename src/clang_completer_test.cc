@@ -202,6 +202,273 @@ TEST_F(TestClangCompleter, TestAddUnsavedFileWithContent) {
   EXPECT_EQ(engine_.file_count(), 1);
 }
 
+TEST_F(TestClangCompleter, TestCacheSeparateFiles) {
+  std::string file1 = "./test/unsaved_file1.cc";
+  std::string content1 =
+      "struct A { int alpha; };\n"
+      "int main() {\n"
+      "  A x; x.\n"
+      "}\n";
+  std::string file2 = "./test/unsaved_file2.cc";
+  std::string content2 =
+      "struct B { int beta; };\n"
+      "int main() {\n"
+      "  B x; x.\n"
+      "}\n";
+
+  CompletionResults results1 =
+      engine_.CodeComplete(file1, content1, 3, 10, cpp_arg_manager_);
+  EXPECT_TRUE(ContainResult(results1, "alpha"));
+  CompletionResults results2 =
+      engine_.CodeComplete(file2, content2, 3, 10, cpp_arg_manager_);
+  EXPECT_TRUE(ContainResult(results2, "beta"));
+  EXPECT_FALSE(ContainResult(results2, "alpha"));
+
+  engine_.CodeComplete(file1, content1, 3, 10, cpp_arg_manager_);
+  EXPECT_EQ(engine_.cache_hits(), 1);
+  EXPECT_EQ(engine_.cache_misses(), 2);
+}
+
+TEST_F(TestClangCompleter, TestSkipUnchangedReparse) {
+  std::string file = "./test/unsaved_file.cc";
+  std::string content =
+      "#include <iostream>\n"
+      "int main() {\n"
+      "  std::\n"
+      "}\n";
+
+  engine_.Parse(file, content, cpp_arg_manager_);
+  engine_.Parse(file, content, cpp_arg_manager_);
+  engine_.Update();
+  CompletionResults results =
+      engine_.CodeComplete(file, content, 3, 8, cpp_arg_manager_);
+  EXPECT_TRUE(ContainResult(results, "cout"));
+  EXPECT_EQ(engine_.reparse_count(), 0);
+
+  std::string changed = content + "\n";
+  engine_.Parse(file, changed, cpp_arg_manager_);
+  EXPECT_EQ(engine_.reparse_count(), 1);
+}
+
+TEST_F(TestClangCompleter, TestUpdateIncludingFilesOnly) {
+  std::string header = "./test/dependency1.h";
+  std::string source1 = "./test/unsaved_file.cc";
+  std::string content1 =
+      "#include \"dependency1.h\"\n"
+      "int main() {\n"
+      "  \n"
+      "}\n";
+  std::string source2 = "./test/sample1.cc";
+
+  engine_.Parse(source1, content1, cpp_arg_manager_);
+  engine_.Parse(source2, GetFileContent(source2), cpp_arg_manager_);
+  EXPECT_EQ(engine_.Update(), 2);
+
+  std::string content = GetFileContent(header) + "\nvoid Baz() {}\n";
+  engine_.Parse(header, content, cpp_arg_manager_);
+  EXPECT_EQ(engine_.Update(), 2);
+  EXPECT_EQ(engine_.reparse_count(), 1);
+
+  CompletionResults results =
+      engine_.CodeComplete(source1, content1, 3, 3, cpp_arg_manager_);
+  EXPECT_TRUE(ContainResult(results, "Baz"));
+}
+
+TEST_F(TestClangCompleter, TestRemoveFile) {
+  std::string header = "./test/dependency1.h";
+  std::string source = "./test/unsaved_file.cc";
+  std::string content =
+      "#include \"dependency1.h\"\n"
+      "int main() {\n"
+      "  \n"
+      "}\n";
+
+  engine_.Parse(source, content, cpp_arg_manager_);
+  engine_.Parse(header, GetFileContent(header) + "void Baz() {}\n",
+                cpp_arg_manager_);
+  engine_.Update();
+  EXPECT_EQ(engine_.file_count(), 2);
+  CompletionResults results =
+      engine_.CodeComplete(source, content, 3, 3, cpp_arg_manager_);
+  EXPECT_TRUE(ContainResult(results, "Baz"));
+
+  // closing the header falls back to the copy on disk
+  engine_.RemoveFile(header);
+  EXPECT_EQ(engine_.file_count(), 1);
+  EXPECT_EQ(engine_.Update(), 0);
+  CompletionResults results2 =
+      engine_.CodeComplete(source, content, 3, 3, cpp_arg_manager_);
+  EXPECT_FALSE(ContainResult(results2, "Baz"));
+  EXPECT_TRUE(ContainResult(results2, "FooBar"));
+}
+
+TEST_F(TestClangCompleter, TestTranslationUnitLimit) {
+  std::string file1 = "./test/sample1.cc";
+  std::string file2 = "./test/sample3.cc";
+  std::string content1 = GetFileContent(file1);
+  std::string content2 = GetFileContent(file2);
+
+  engine_.set_max_translation_units(1);
+  engine_.Parse(file1, content1, cpp_arg_manager_);
+  engine_.Parse(file2, content2, cpp_arg_manager_);
+  EXPECT_EQ(engine_.translation_unit_count(), 1);
+  EXPECT_GT(engine_.memory_usage(), 0);
+
+  // disposed unit is parsed again when visited
+  CompletionResults results =
+      engine_.CodeComplete(file1, content1, 4, 1, cpp_arg_manager_);
+  EXPECT_TRUE(ContainResult(results, "std"));
+  EXPECT_EQ(engine_.translation_unit_count(), 1);
+
+  engine_.set_max_translation_units(0);
+  engine_.Parse(file2, content2, cpp_arg_manager_);
+  EXPECT_EQ(engine_.translation_unit_count(), 2);
+
+  engine_.set_max_memory(1);
+  EXPECT_EQ(engine_.translation_unit_count(), 1);
+}
+
+TEST_F(TestClangCompleter, TestArgumentProfiles) {
+  std::string file = "./test/dependency1.h";
+  std::string content = GetFileContent(file);
+
+  engine_.Parse(file, content, cpp_arg_manager_);
+  engine_.Parse(file, content, cpp_arg_manager_);
+  EXPECT_EQ(engine_.translation_unit_count(), 1);
+
+  // same file under another argument profile gets its own unit,
+  // but the buffer is only held once
+  engine_.Parse(file, content, objcpp_arg_manager_);
+  EXPECT_EQ(engine_.translation_unit_count(), 2);
+  EXPECT_EQ(engine_.file_count(), 1);
+
+  engine_.RemoveFile(file);
+  EXPECT_EQ(engine_.translation_unit_count(), 0);
+}
+
+TEST_F(TestClangCompleter, TestCompletionCandidates) {
+  std::string file = "./test/unsaved_candidates.cc";
+  std::string content =
+      "struct A { int alpha(int x); };\n"
+      "void f(A a) {\n"
+      "  a.\n"
+      "}\n";
+
+  CompletionCandidates candidates =
+      engine_.CodeCompleteCandidates(file, content, 3, 5, cpp_arg_manager_);
+  bool found = false;
+  for (int i = 0; i < candidates.size(); ++i) {
+    if (candidates[i].word == "alpha") {
+      found = true;
+      EXPECT_EQ(candidates[i].abbr, "alpha");
+      EXPECT_EQ(candidates[i].menu, "int");
+      EXPECT_EQ(candidates[i].info, "alpha(int x)");
+      EXPECT_EQ(candidates[i].kind, "alpha(int x)");
+    }
+  }
+  EXPECT_TRUE(found);
+}
+
+TEST_F(TestClangCompleter, TestCodeCompletePrefix) {
+  std::string file = "./test/unsaved_prefix.cc";
+  std::string content =
+      "#include <iostream>\n"
+      "int main() {\n"
+      "  std::cou\n"
+      "}\n";
+
+  CompletionResults all =
+      engine_.CodeComplete(file, content, 3, 8, cpp_arg_manager_);
+  CompletionResults results =
+      engine_.CodeComplete(file, content, 3, 8, cpp_arg_manager_, "cou", 5);
+  ASSERT_FALSE(results.empty());
+  EXPECT_LE(results.size(), 5);
+  EXPECT_LT(results.size(), all.size());
+  EXPECT_EQ(TypedText(results[0]), "cout");
+
+  CompletionCandidates candidates = engine_.CodeCompleteCandidates(
+      file, content, 3, 8, cpp_arg_manager_, "cou", 5);
+  ASSERT_EQ(candidates.size(), results.size());
+  EXPECT_EQ(candidates[0].word, "cout");
+}
+
+TEST_F(TestClangCompleter, TestPreambleCache) {
+  char directory_template[] = "/tmp/preamble_cacheXXXXXX";
+  std::string directory = mkdtemp(directory_template);
+  std::string file = "./test/unsaved_preamble.cc";
+  std::string content =
+      "// comment\n"
+      "#include <iostream>\n"
+      "#include <vector>\n"
+      "int main() {\n"
+      "  std::\n"
+      "}\n";
+
+  engine_.set_preamble_cache(directory, PreambleCache::kDefaultMaxBytes);
+  CompletionResults results =
+      engine_.CodeComplete(file, content, 5, 8, cpp_arg_manager_);
+  EXPECT_TRUE(ContainResult(results, "cout"));
+  EXPECT_TRUE(ContainResult(results, "vector"));
+  EXPECT_EQ(engine_.preamble_cache_builds(), 1);
+
+  // a new session uses the header built before
+  ClangCompleter engine;
+  engine.set_preamble_cache(directory, PreambleCache::kDefaultMaxBytes);
+  results = engine.CodeComplete(file, content, 5, 8, cpp_arg_manager_);
+  EXPECT_TRUE(ContainResult(results, "cout"));
+  EXPECT_EQ(engine.preamble_cache_hits(), 1);
+  EXPECT_EQ(engine.preamble_cache_builds(), 0);
+
+  // older headers are evicted once the cache is over its size
+  ClangCompleter small_engine;
+  small_engine.set_preamble_cache(directory, 1);
+  small_engine.Parse("./test/unsaved_preamble2.cc",
+                     "#include <vector>\nint main() {}\n", cpp_arg_manager_);
+  EXPECT_EQ(small_engine.preamble_cache_builds(), 1);
+  std::string remaining = "ls " + directory + "/*.pch | wc -l";
+  FILE* pipe = popen(remaining.c_str(), "r");
+  int count = 0;
+  EXPECT_EQ(fscanf(pipe, "%d", &count), 1);
+  pclose(pipe);
+  EXPECT_EQ(count, 1);
+
+  std::string remove = "rm -rf " + directory;
+  EXPECT_EQ(system(remove.c_str()), 0);
+}
+
+TEST(TestPreamble, ExtractPreamble) {
+  EXPECT_EQ(ExtractPreamble("/* license\n * text */\n#pragma once\n"
+                            "#include <vector>\n#include  <map> // maps\n"
+                            "#include \"local.h\"\n#include <set>\n"),
+            "#include <vector>\n#include <map>\n");
+  EXPECT_EQ(ExtractPreamble("#define X\n#include <vector>\n"), "");
+}
+
+TEST_F(TestClangCompleter, TestStats) {
+  std::string file = "./test/unsaved_stats.cc";
+  std::string content =
+      "struct A { int alpha; };\n"
+      "void f(A a) {\n"
+      "  a.\n"
+      "}\n";
+
+  engine_.CodeComplete(file, content, 3, 5, cpp_arg_manager_);
+  engine_.Parse(file, content + "// changed\n", cpp_arg_manager_);
+  engine_.CodeComplete(file, content + "// changed\n", 3, 5, cpp_arg_manager_);
+
+  std::vector<TranslationUnitStats> stats = engine_.stats();
+  ASSERT_EQ(stats.size(), 1);
+  EXPECT_EQ(stats[0].file, file);
+  EXPECT_EQ(stats[0].parses, 1);
+  EXPECT_EQ(stats[0].reparses, 1);
+  EXPECT_EQ(stats[0].completions, 2);
+  EXPECT_GE(stats[0].results, 1);
+  EXPECT_GT(stats[0].average_parse_ms, 0.0);
+  EXPECT_GT(stats[0].last_complete_ms, 0.0);
+  EXPECT_GT(stats[0].memory_usage, 0);
+  EXPECT_EQ(engine_.unsaved_bytes(), content.size() + 11);
+}
+
 TEST_F(TestClangCompleter, TestObjcBasicLibrary) {
   std::string file = "./test/sample1.m";
   std::string content = GetFileContent(file);
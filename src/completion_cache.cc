@@ -0,0 +1,100 @@
+#include "completion_cache.h"
+
+#include <iterator>
+
+const size_t CompletionCache::kDefaultMaxBytes;
+
+size_t EstimateResultsSize(const CompletionResults& results) {
+  size_t bytes = sizeof(CompletionResults);
+  for (int i = 0; i < results.size(); ++i) {
+    bytes += sizeof(CompletionResult);
+    for (int j = 0; j < results[i].size(); ++j) {
+      bytes += sizeof(CompletionResultData) + results[i][j].first.size() +
+               results[i][j].second.size();
+    }
+  }
+  return bytes;
+}
+
+CompletionCache::CompletionCache(size_t max_bytes)
+    : max_bytes_(max_bytes), bytes_(0), hits_(0), misses_(0), evictions_(0) {}
+
+bool CompletionCache::Lookup(const std::string& unit, const std::string& token,
+                             int generation, CompletionResults& results) {
+  const CompletionResults* found = Find(unit, token, generation);
+  if (!found) {
+    return false;
+  }
+  results = *found;
+  return true;
+}
+
+const CompletionResults* CompletionCache::Find(const std::string& unit,
+                                               const std::string& token,
+                                               int generation) {
+  auto found = index_.find(CompletionCacheKey{unit, token, generation});
+  if (found == index_.end()) {
+    ++misses_;
+    return nullptr;
+  }
+
+  // move to the front as the most recently used entry
+  entries_.splice(entries_.begin(), entries_, found->second);
+  ++hits_;
+  return &found->second->results;
+}
+
+void CompletionCache::Insert(const std::string& unit, const std::string& token,
+                             int generation, const CompletionResults& results) {
+  CompletionCacheKey key{unit, token, generation};
+  auto found = index_.find(key);
+  if (found != index_.end()) {
+    Erase(found->second);
+  }
+
+  size_t bytes = EstimateResultsSize(results);
+  if (bytes > max_bytes_) {
+    // would evict everything else and still not fit
+    return;
+  }
+
+  Shrink(max_bytes_ - bytes);
+  entries_.push_front(Entry{key, results, bytes});
+  index_[key] = entries_.begin();
+  bytes_ += bytes;
+}
+
+void CompletionCache::RemoveStale(const std::string& unit, int generation) {
+  auto it = index_.lower_bound(CompletionCacheKey{unit, "", 0});
+  while (it != index_.end() && it->first.unit == unit) {
+    EntryIterator entry = it->second;
+    ++it;
+    if (entry->key.generation < generation) {
+      Erase(entry);
+    }
+  }
+}
+
+void CompletionCache::clear() {
+  entries_.clear();
+  index_.clear();
+  bytes_ = 0;
+}
+
+void CompletionCache::set_max_bytes(size_t max_bytes) {
+  max_bytes_ = max_bytes;
+  Shrink(max_bytes_);
+}
+
+void CompletionCache::Erase(EntryIterator it) {
+  bytes_ -= it->bytes;
+  index_.erase(it->key);
+  entries_.erase(it);
+}
+
+void CompletionCache::Shrink(size_t max_bytes) {
+  while (bytes_ > max_bytes && !entries_.empty()) {
+    Erase(std::prev(entries_.end()));
+    ++evictions_;
+  }
+}
@@ -1,7 +1,9 @@
 #ifndef COMPLETION_CACHE_H
 #define COMPLETION_CACHE_H
 
+#include <list>
 #include <map>
+#include <string>
 #include <utility>
 #include <vector>
 
@@ -9,16 +11,64 @@
 
 typedef std::vector<CompletionResult> CompletionResults;
 
-class CompletionCache : public std::map<std::string, CompletionResults> {
- public:
-  CompletionCache() = default;
+struct CompletionCacheKey {
+  std::string unit;
+  std::string token;
+  int generation;
 
-  bool has_cache(const std::string& token) {
-    return this->find(token) != this->end();
-  }
-  void insert(const std::string& token, const CompletionResults& results) {
-    (*this)[token] = results;
+  bool operator<(const CompletionCacheKey& other) const {
+    if (unit != other.unit) return unit < other.unit;
+    if (token != other.token) return token < other.token;
+    return generation < other.generation;
   }
 };
 
+// least recently used cache of completion results, keyed by
+// (translation unit, token, unit generation) and bounded by a byte budget
+class CompletionCache {
+ public:
+  static const size_t kDefaultMaxBytes = 64 * 1024 * 1024;
+
+  explicit CompletionCache(size_t max_bytes = kDefaultMaxBytes);
+
+  bool Lookup(const std::string& unit, const std::string& token,
+              int generation, CompletionResults& results);
+  // cached results without copying them, valid until the next insertion
+  const CompletionResults* Find(const std::string& unit,
+                                const std::string& token, int generation);
+  void Insert(const std::string& unit, const std::string& token,
+              int generation, const CompletionResults& results);
+  void RemoveStale(const std::string& unit, int generation);
+  void clear();
+
+  void set_max_bytes(size_t max_bytes);
+  size_t max_bytes() const { return max_bytes_; }
+  size_t bytes() const { return bytes_; }
+  size_t size() const { return index_.size(); }
+  size_t hits() const { return hits_; }
+  size_t misses() const { return misses_; }
+  size_t evictions() const { return evictions_; }
+
+ private:
+  struct Entry {
+    CompletionCacheKey key;
+    CompletionResults results;
+    size_t bytes;
+  };
+  typedef std::list<Entry>::iterator EntryIterator;
+
+  void Erase(EntryIterator it);
+  void Shrink(size_t max_bytes);
+
+  std::list<Entry> entries_;
+  std::map<CompletionCacheKey, EntryIterator> index_;
+  size_t max_bytes_;
+  size_t bytes_;
+  size_t hits_;
+  size_t misses_;
+  size_t evictions_;
+};
+
+size_t EstimateResultsSize(const CompletionResults& results);
+
 #endif /* end of include guard: COMPLETION_CACHE_H */
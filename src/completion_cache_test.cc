@@ -0,0 +1,81 @@
+#include <string>
+
+#include <gtest/gtest.h>
+
+#include "completion_cache.h"
+
+CompletionResults MakeResults(const std::string& text, int count) {
+  CompletionResults results;
+  for (int i = 0; i < count; ++i) {
+    CompletionResult result;
+    result.push_back(std::make_pair("TypedText", text));
+    results.push_back(result);
+  }
+  return results;
+}
+
+TEST(TestCompletionCache, SeparateFiles) {
+  CompletionCache cache;
+  cache.Insert("a.cc", "std::", 0, MakeResults("a", 1));
+
+  CompletionResults results;
+  EXPECT_FALSE(cache.Lookup("b.cc", "std::", 0, results));
+  EXPECT_TRUE(cache.Lookup("a.cc", "std::", 0, results));
+  EXPECT_EQ(results[0][0].second, "a");
+  EXPECT_EQ(cache.hits(), 1);
+  EXPECT_EQ(cache.misses(), 1);
+}
+
+TEST(TestCompletionCache, Generation) {
+  CompletionCache cache;
+  cache.Insert("a.cc", "std::", 0, MakeResults("a", 1));
+  cache.Insert("b.cc", "std::", 0, MakeResults("b", 1));
+
+  CompletionResults results;
+  EXPECT_FALSE(cache.Lookup("a.cc", "std::", 1, results));
+
+  cache.RemoveStale("a.cc", 1);
+  EXPECT_EQ(cache.size(), 1);
+  EXPECT_TRUE(cache.Lookup("b.cc", "std::", 0, results));
+}
+
+TEST(TestCompletionCache, EvictLeastRecentlyUsed) {
+  size_t entry_bytes = EstimateResultsSize(MakeResults("x", 10));
+  CompletionCache cache(entry_bytes * 2);
+  cache.Insert("a.cc", "a.", 0, MakeResults("a", 10));
+  cache.Insert("a.cc", "b.", 0, MakeResults("b", 10));
+
+  CompletionResults results;
+  EXPECT_TRUE(cache.Lookup("a.cc", "a.", 0, results));
+
+  cache.Insert("a.cc", "c.", 0, MakeResults("c", 10));
+  EXPECT_EQ(cache.size(), 2);
+  EXPECT_EQ(cache.evictions(), 1);
+  EXPECT_LE(cache.bytes(), cache.max_bytes());
+  EXPECT_TRUE(cache.Lookup("a.cc", "a.", 0, results));
+  EXPECT_FALSE(cache.Lookup("a.cc", "b.", 0, results));
+  EXPECT_TRUE(cache.Lookup("a.cc", "c.", 0, results));
+}
+
+TEST(TestCompletionCache, Budget) {
+  size_t entry_bytes = EstimateResultsSize(MakeResults("x", 10));
+  CompletionCache cache(entry_bytes * 4);
+  for (int i = 0; i < 100; ++i) {
+    cache.Insert("a.cc", std::to_string(i) + ".", 0, MakeResults("x", 10));
+    EXPECT_LE(cache.bytes(), cache.max_bytes());
+  }
+  EXPECT_EQ(cache.size(), 4);
+
+  cache.set_max_bytes(entry_bytes);
+  EXPECT_EQ(cache.size(), 1);
+
+  // larger than the whole budget
+  cache.Insert("a.cc", "large.", 0, MakeResults("x", 100));
+  CompletionResults results;
+  EXPECT_FALSE(cache.Lookup("a.cc", "large.", 0, results));
+}
+
+int main(int argc, char **argv) {
+  ::testing::InitGoogleTest(&argc, argv);
+  return RUN_ALL_TESTS();
+}
@@ -84,3 +84,31 @@ CompletionResult ParseResult(CXCompletionString cs) {
   }
   return result;
 }
+
+CompletionCandidate MakeCandidate(const CompletionResult& result) {
+  CompletionCandidate candidate;
+  for (int i = 0; i < result.size(); ++i) {
+    const std::string& kind = result[i].first;
+    if (kind == "TypedText") {
+      candidate.word = result[i].second;
+    }
+    if (kind == "ResultType") {
+      candidate.menu = result[i].second;
+    } else {
+      candidate.info += result[i].second;
+    }
+  }
+  candidate.abbr = candidate.word;
+  candidate.kind = candidate.info;
+  return candidate;
+}
+
+const std::string& TypedText(const CompletionResult& result) {
+  static const std::string empty;
+  for (int i = 0; i < result.size(); ++i) {
+    if (result[i].first == "TypedText") {
+      return result[i].second;
+    }
+  }
+  return empty;
+}
@@ -10,6 +10,18 @@
 typedef std::pair<std::string, std::string> CompletionResultData;
 typedef std::vector<CompletionResultData> CompletionResult;
 
+// completion result shaped into the fields of a deoplete candidate
+struct CompletionCandidate {
+  std::string word;
+  std::string abbr;
+  std::string menu;
+  std::string info;
+  std::string kind;
+};
+typedef std::vector<CompletionCandidate> CompletionCandidates;
+
 CompletionResult ParseResult(CXCompletionString cs);
+CompletionCandidate MakeCandidate(const CompletionResult& result);
+const std::string& TypedText(const CompletionResult& result);
 
 #endif /* end of include guard: COMPLETION_RESULTS_H */
@@ -1,6 +1,17 @@
 #include "file_content.h"
 
-FileContent::FileContent() {}
+#include <climits>
+#include <cstdlib>
+
+std::string NormalizePath(const std::string& path) {
+  char resolved[PATH_MAX];
+  if (realpath(path.c_str(), resolved)) {
+    return resolved;
+  }
+  return path;
+}
+
+FileContent::FileContent() : revision_(0) {}
 
 std::vector<CXUnsavedFile> FileContent::GetUnsavedFiles() const {
   std::vector<CXUnsavedFile> unsaved_files;
@@ -29,3 +40,53 @@ std::vector<CXUnsavedFile> FileContent::GetUnsavedFiles(
   }
   return unsaved_files;
 }
+
+std::vector<CXUnsavedFile> FileContent::GetRelevantUnsavedFiles(
+    const std::string& file, const std::set<std::string>& inclusions) const {
+  std::vector<CXUnsavedFile> unsaved_files;
+  for (auto it = begin(); it != end(); ++it) {
+    if (it->first != file && !inclusions.count(path(it->first))) {
+      continue;
+    }
+
+    unsaved_files.push_back(CXUnsavedFile{
+        it->first.c_str(),
+        it->second.c_str(),
+        it->second.length(),
+    });
+  }
+  return unsaved_files;
+}
+
+void FileContent::remove(const std::string& file) {
+  if (erase(file) > 0) {
+    hashes_.erase(file);
+    revisions_.erase(file);
+    paths_.erase(file);
+    ++revision_;
+  }
+}
+
+std::vector<std::string> FileContent::files() const {
+  std::vector<std::string> files;
+  for (auto it = begin(); it != end(); ++it) {
+    files.push_back(it->first);
+  }
+  return files;
+}
+
+std::string FileContent::path(const std::string& file) const {
+  auto found = paths_.find(file);
+  if (found != paths_.end()) {
+    return found->second;
+  }
+  return NormalizePath(file);
+}
+
+size_t FileContent::bytes() const {
+  size_t total = 0;
+  for (auto it = begin(); it != end(); ++it) {
+    total += it->second.size();
+  }
+  return total;
+}
@@ -1,12 +1,16 @@
 #ifndef FILE_CONTENT_H
 #define FILE_CONTENT_H
 
+#include <functional>
 #include <map>
+#include <set>
 #include <string>
 #include <vector>
 
 #include <clang-c/Index.h>
 
+std::string NormalizePath(const std::string& path);
+
 class FileContent : public std::map<std::string, std::string> {
  public:
   FileContent();
@@ -14,14 +18,43 @@ class FileContent : public std::map<std::string, std::string> {
   std::vector<CXUnsavedFile> GetUnsavedFiles() const;
   std::vector<CXUnsavedFile> GetUnsavedFiles(
       const std::string& current_file, const std::string& current_file_content);
+  std::vector<CXUnsavedFile> GetRelevantUnsavedFiles(
+      const std::string& file, const std::set<std::string>& inclusions) const;
+
+  // returns false when the file already holds the same content
+  bool insert(const std::string& file, const std::string& content) {
+    size_t hash = std::hash<std::string>()(content);
+    auto found = hashes_.find(file);
+    if (found != hashes_.end() && found->second == hash) {
+      return false;
+    }
+    if (found == hashes_.end()) {
+      paths_[file] = NormalizePath(file);
+    }
 
-  void insert(const std::string& file, const std::string& content) {
     (*this)[file] = content;
+    hashes_[file] = hash;
+    revisions_[file] = ++revision_;
+    return true;
   }
+  void remove(const std::string& file);
   bool has_file(const std::string& file) {
     return find(file) != end();
   }
   int file_count() const { return size(); }
+  // bytes of unsaved content held
+  size_t bytes() const;
+  std::vector<std::string> files() const;
+  std::string path(const std::string& file) const;
+  int revision() const { return revision_; }
+  // revision at which each file last changed
+  const std::map<std::string, int>& revisions() const { return revisions_; }
+
+ private:
+  std::map<std::string, size_t> hashes_;
+  std::map<std::string, int> revisions_;
+  std::map<std::string, std::string> paths_;
+  int revision_;
 };
 
 #endif /* end of include guard: FILE_CONTENT_H */
@@ -0,0 +1,97 @@
+#include "fuzzy_match.h"
+
+#include <algorithm>
+#include <cctype>
+#include <utility>
+
+namespace {
+
+const int kMatchScore = 16;
+const int kBoundaryBonus = 24;
+const int kConsecutiveBonus = 16;
+const int kCaseBonus = 2;
+const int kPrefixBonus = 256;
+
+char Lower(char c) {
+  return static_cast<char>(std::tolower(static_cast<unsigned char>(c)));
+}
+
+// start of a word part, as in snake_case or camelCase
+bool IsBoundary(const std::string& word, size_t i) {
+  if (i == 0) {
+    return true;
+  }
+  char previous = word[i - 1];
+  char current = word[i];
+  return previous == '_' ||
+         (std::islower(static_cast<unsigned char>(previous)) &&
+          std::isupper(static_cast<unsigned char>(current)));
+}
+
+}  // namespace
+
+int FuzzyScore(const std::string& word, const std::string& pattern) {
+  if (pattern.empty()) {
+    return 0;
+  }
+  if (pattern.size() > word.size()) {
+    return -1;
+  }
+
+  int score = 0;
+  size_t j = 0;
+  size_t previous = std::string::npos;
+  for (size_t i = 0; i < word.size() && j < pattern.size(); ++i) {
+    if (Lower(word[i]) != Lower(pattern[j])) {
+      continue;
+    }
+    score += kMatchScore;
+    if (IsBoundary(word, i)) {
+      score += kBoundaryBonus;
+    }
+    if (previous != std::string::npos && previous + 1 == i) {
+      score += kConsecutiveBonus;
+    }
+    if (word[i] == pattern[j]) {
+      score += kCaseBonus;
+    }
+    previous = i;
+    ++j;
+  }
+  if (j < pattern.size()) {
+    return -1;
+  }
+
+  if (previous + 1 == pattern.size()) {
+    score += kPrefixBonus;
+  }
+  // prefer shorter words among equal matches
+  return std::max(score - static_cast<int>(word.size() - pattern.size()), 1);
+}
+
+std::vector<int> RankWords(const std::vector<std::string>& words,
+                           const std::string& pattern, int max_results) {
+  std::vector<std::pair<int, int>> scored;
+  scored.reserve(words.size());
+  for (int i = 0; i < words.size(); ++i) {
+    int score = FuzzyScore(words[i], pattern);
+    if (score >= 0) {
+      scored.push_back(std::make_pair(-score, i));
+    }
+  }
+
+  size_t count = scored.size();
+  if (max_results > 0 && max_results < count) {
+    count = max_results;
+    std::partial_sort(scored.begin(), scored.begin() + count, scored.end());
+  } else {
+    std::sort(scored.begin(), scored.end());
+  }
+
+  std::vector<int> indices;
+  indices.reserve(count);
+  for (size_t i = 0; i < count; ++i) {
+    indices.push_back(scored[i].second);
+  }
+  return indices;
+}
@@ -0,0 +1,16 @@
+#ifndef FUZZY_MATCH_H
+#define FUZZY_MATCH_H
+
+#include <string>
+#include <vector>
+
+// score of pattern as a case insensitive subsequence of word, higher is
+// better and -1 when pattern does not match
+int FuzzyScore(const std::string& word, const std::string& pattern);
+
+// indices of the words matching pattern, best scores first and the input
+// order kept among equal scores, at most max_results when it is positive
+std::vector<int> RankWords(const std::vector<std::string>& words,
+                           const std::string& pattern, int max_results);
+
+#endif /* end of include guard: FUZZY_MATCH_H */
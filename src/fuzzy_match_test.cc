@@ -0,0 +1,46 @@
+#include <string>
+#include <vector>
+
+#include <gtest/gtest.h>
+
+#include "fuzzy_match.h"
+
+TEST(TestFuzzyMatch, FuzzyScore) {
+  EXPECT_EQ(FuzzyScore("printf", ""), 0);
+  EXPECT_GT(FuzzyScore("printf", "pri"), 0);
+  EXPECT_GT(FuzzyScore("printf", "PRI"), 0);
+  EXPECT_GT(FuzzyScore("printf", "ptf"), 0);
+  EXPECT_EQ(FuzzyScore("printf", "fp"), -1);
+  EXPECT_EQ(FuzzyScore("pr", "pri"), -1);
+
+  // prefixes and exact case first
+  EXPECT_GT(FuzzyScore("printf", "pri"), FuzzyScore("sprintf", "pri"));
+  EXPECT_GT(FuzzyScore("printf", "pri"), FuzzyScore("Printf", "pri"));
+  // word boundaries before gaps
+  EXPECT_GT(FuzzyScore("push_back", "pb"), FuzzyScore("probe", "pb"));
+  EXPECT_GT(FuzzyScore("pushBack", "pb"), FuzzyScore("probe", "pb"));
+  // shorter words among equal matches
+  EXPECT_GT(FuzzyScore("size", "si"), FuzzyScore("size_type", "si"));
+}
+
+TEST(TestFuzzyMatch, RankWords) {
+  std::vector<std::string> words = {"sprintf", "printf", "puts", "print",
+                                    "fprintf"};
+  std::vector<int> ranked = RankWords(words, "pri", 0);
+  ASSERT_EQ(ranked.size(), 4);
+  EXPECT_EQ(words[ranked[0]], "print");
+  EXPECT_EQ(words[ranked[1]], "printf");
+
+  ranked = RankWords(words, "pri", 2);
+  ASSERT_EQ(ranked.size(), 2);
+  EXPECT_EQ(words[ranked[0]], "print");
+
+  // input order is kept among equal scores
+  ranked = RankWords(words, "", 3);
+  EXPECT_EQ(ranked, std::vector<int>({0, 1, 2}));
+}
+
+int main(int argc, char **argv) {
+  ::testing::InitGoogleTest(&argc, argv);
+  return RUN_ALL_TESTS();
+}
@@ -0,0 +1,279 @@
+#include "preamble_cache.h"
+
+#include <dirent.h>
+#include <sys/stat.h>
+#include <sys/time.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <cerrno>
+#include <cstdio>
+#include <fstream>
+#include <functional>
+#include <set>
+#include <sstream>
+
+#include "file_content.h"
+
+const size_t PreambleCache::kDefaultMaxBytes;
+
+namespace {
+
+bool StartsWith(const std::string& text, const std::string& prefix) {
+  return text.compare(0, prefix.size(), prefix) == 0;
+}
+
+bool EndsWith(const std::string& text, const std::string& suffix) {
+  return text.size() >= suffix.size() &&
+         text.compare(text.size() - suffix.size(), suffix.size(), suffix) == 0;
+}
+
+std::string Trim(const std::string& text) {
+  size_t begin = text.find_first_not_of(" \t\r");
+  if (begin == std::string::npos) {
+    return "";
+  }
+  size_t end = text.find_last_not_of(" \t\r");
+  return text.substr(begin, end - begin + 1);
+}
+
+bool MakeDirectories(const std::string& path) {
+  for (size_t i = 1; i <= path.size(); ++i) {
+    if (i == path.size() || path[i] == '/') {
+      std::string part = path.substr(0, i);
+      if (mkdir(part.c_str(), 0755) != 0 && errno != EEXIST) {
+        return false;
+      }
+    }
+  }
+  return true;
+}
+
+bool ModificationTime(const std::string& path, long long& mtime) {
+  struct stat st;
+  if (stat(path.c_str(), &st) != 0) {
+    return false;
+  }
+  mtime = st.st_mtime;
+  return true;
+}
+
+// language of the arguments as a header language, c++-header for -xc++
+std::string HeaderLanguage(const std::vector<std::string>& args) {
+  std::string language = "c++";
+  for (int i = 0; i < args.size(); ++i) {
+    if (args[i] == "-x" && i + 1 < args.size()) {
+      language = args[i + 1];
+    } else if (StartsWith(args[i], "-x") && args[i].size() > 2) {
+      language = args[i].substr(2);
+    }
+  }
+  if (!EndsWith(language, "-header")) {
+    language += "-header";
+  }
+  return language;
+}
+
+std::string ClangVersion() {
+  CXString version = clang_getClangVersion();
+  std::string result = clang_getCString(version);
+  clang_disposeString(version);
+  return result;
+}
+
+void DependencyVisitor(CXFile included_file, CXSourceLocation*, unsigned,
+                       CXClientData client_data) {
+  std::set<std::string>* dependencies =
+      static_cast<std::set<std::string>*>(client_data);
+  CXString filename = clang_getFileName(included_file);
+  const char* name = clang_getCString(filename);
+  if (name) {
+    dependencies->insert(NormalizePath(name));
+  }
+  clang_disposeString(filename);
+}
+
+struct CacheFile {
+  long long mtime;
+  size_t bytes;
+  std::string key;
+
+  bool operator<(const CacheFile& other) const { return mtime < other.mtime; }
+};
+
+}  // namespace
+
+std::string ExtractPreamble(const std::string& content) {
+  std::string preamble;
+  std::istringstream lines(content);
+  std::string line;
+  bool in_comment = false;
+  while (std::getline(lines, line)) {
+    line = Trim(line);
+    if (in_comment) {
+      in_comment = line.find("*/") == std::string::npos;
+      continue;
+    }
+    if (line.empty() || StartsWith(line, "//") ||
+        StartsWith(line, "#pragma once")) {
+      continue;
+    }
+    if (StartsWith(line, "/*")) {
+      in_comment = line.find("*/", 2) == std::string::npos;
+      continue;
+    }
+    if (!StartsWith(line, "#include")) {
+      break;
+    }
+
+    std::string header = Trim(line.substr(8));
+    size_t end = header.find('>');
+    if (header.empty() || header[0] != '<' || end == std::string::npos) {
+      // project headers change too often to be precompiled
+      break;
+    }
+    preamble += "#include " + header.substr(0, end + 1) + "\n";
+  }
+  return preamble;
+}
+
+PreambleCache::PreambleCache()
+    : max_bytes_(kDefaultMaxBytes), hits_(0), builds_(0), evictions_(0) {}
+
+std::string PreambleCache::Get(CXIndex index, const std::string& content,
+                               const std::vector<std::string>& args,
+                               const std::vector<std::string>& open_files) {
+  if (directory_.empty()) {
+    return "";
+  }
+  std::string includes = ExtractPreamble(content);
+  if (includes.empty()) {
+    return "";
+  }
+
+  std::string identity = ClangVersion();
+  for (int i = 0; i < args.size(); ++i) {
+    identity += '\0' + args[i];
+  }
+  identity += '\0' + includes;
+  std::ostringstream key_stream;
+  key_stream << std::hex << std::hash<std::string>()(identity);
+  std::string key = key_stream.str();
+  std::string path = directory_ + "/" + key + ".pch";
+
+  std::ifstream input(directory_ + "/" + key + ".deps");
+  bool valid = input.is_open();
+  long long mtime;
+  std::string dependency;
+  while (valid && input >> mtime && std::getline(input >> std::ws, dependency)) {
+    if (std::find(open_files.begin(), open_files.end(), dependency) !=
+        open_files.end()) {
+      // the buffer may differ from the file on disk
+      return "";
+    }
+    long long current;
+    valid = ModificationTime(dependency, current) && current == mtime;
+  }
+
+  if (valid && access(path.c_str(), R_OK) == 0) {
+    // keep recently used headers from being evicted
+    utimes(path.c_str(), nullptr);
+    ++hits_;
+    return path;
+  }
+  if (!Build(index, key, includes, args)) {
+    return "";
+  }
+  Evict(key);
+  return path;
+}
+
+bool PreambleCache::Build(CXIndex index, const std::string& key,
+                          const std::string& includes,
+                          const std::vector<std::string>& args) {
+  if (!MakeDirectories(directory_)) {
+    return false;
+  }
+  std::string base = directory_ + "/" + key;
+  std::string header = base + ".h";
+  {
+    std::ofstream output(header);
+    output << includes;
+    if (!output) {
+      return false;
+    }
+  }
+
+  std::string language = "-x" + HeaderLanguage(args);
+  std::vector<const char*> header_args;
+  for (int i = 0; i < args.size(); ++i) {
+    header_args.push_back(args[i].c_str());
+  }
+  header_args.push_back(language.c_str());
+
+  CXTranslationUnit unit = clang_parseTranslationUnit(
+      index, header.c_str(), header_args.data(), header_args.size(), nullptr,
+      0, CXTranslationUnit_Incomplete);
+  if (!unit) {
+    return false;
+  }
+
+  std::set<std::string> dependencies;
+  clang_getInclusions(unit, DependencyVisitor, &dependencies);
+  std::string temporary = base + ".pch.tmp";
+  bool saved = clang_saveTranslationUnit(unit, temporary.c_str(),
+                                         clang_defaultSaveOptions(unit)) ==
+               CXSaveError_None;
+  clang_disposeTranslationUnit(unit);
+  if (!saved || std::rename(temporary.c_str(), (base + ".pch").c_str()) != 0) {
+    std::remove(temporary.c_str());
+    return false;
+  }
+
+  std::ofstream output(base + ".deps");
+  for (auto it = dependencies.begin(); it != dependencies.end(); ++it) {
+    long long mtime;
+    if (ModificationTime(*it, mtime)) {
+      output << mtime << " " << *it << "\n";
+    }
+  }
+  ++builds_;
+  return true;
+}
+
+void PreambleCache::Evict(const std::string& keep) {
+  DIR* dir = opendir(directory_.c_str());
+  if (!dir) {
+    return;
+  }
+  std::vector<CacheFile> files;
+  size_t total = 0;
+  while (struct dirent* entry = readdir(dir)) {
+    std::string name = entry->d_name;
+    if (!EndsWith(name, ".pch")) {
+      continue;
+    }
+    struct stat st;
+    if (stat((directory_ + "/" + name).c_str(), &st) != 0) {
+      continue;
+    }
+    std::string key = name.substr(0, name.size() - 4);
+    total += st.st_size;
+    if (key != keep) {
+      files.push_back(CacheFile{st.st_mtime, static_cast<size_t>(st.st_size),
+                                key});
+    }
+  }
+  closedir(dir);
+
+  // least recently used first
+  std::sort(files.begin(), files.end());
+  for (int i = 0; i < files.size() && total > max_bytes_; ++i) {
+    std::string base = directory_ + "/" + files[i].key;
+    std::remove((base + ".pch").c_str());
+    std::remove((base + ".deps").c_str());
+    std::remove((base + ".h").c_str());
+    total -= files[i].bytes;
+    ++evictions_;
+  }
+}
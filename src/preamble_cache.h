@@ -0,0 +1,51 @@
+#ifndef PREAMBLE_CACHE_H
+#define PREAMBLE_CACHE_H
+
+#include <string>
+#include <vector>
+
+#include <clang-c/Index.h>
+
+// precompiled headers of the system includes at the top of a file, kept
+// on disk so that they outlive the editor session.
+// a header is keyed by the compile arguments and the include lines, and
+// rebuilt when a header it depends on changed
+class PreambleCache {
+ public:
+  static const size_t kDefaultMaxBytes = 1024 * 1024 * 1024;
+
+  PreambleCache();
+
+  // path of the precompiled header for content, built when missing or
+  // stale, empty when there is none to use. headers open in the editor
+  // are never taken from a precompiled header
+  std::string Get(CXIndex index, const std::string& content,
+                  const std::vector<std::string>& args,
+                  const std::vector<std::string>& open_files);
+
+  // an empty directory disables the cache
+  void set_directory(const std::string& directory) { directory_ = directory; }
+  const std::string& directory() const { return directory_; }
+  void set_max_bytes(size_t max_bytes) { max_bytes_ = max_bytes; }
+  size_t max_bytes() const { return max_bytes_; }
+  size_t hits() const { return hits_; }
+  size_t builds() const { return builds_; }
+  size_t evictions() const { return evictions_; }
+
+ private:
+  bool Build(CXIndex index, const std::string& key,
+             const std::string& includes,
+             const std::vector<std::string>& args);
+  void Evict(const std::string& keep);
+
+  std::string directory_;
+  size_t max_bytes_;
+  size_t hits_;
+  size_t builds_;
+  size_t evictions_;
+};
+
+// leading #include <...> lines of content, empty when there is none
+std::string ExtractPreamble(const std::string& content);
+
+#endif /* end of include guard: PREAMBLE_CACHE_H */
@@ -1,110 +1,123 @@
 #include "token.h"
 
-bool GetToken(const std::string& content, std::string& token) {
-  // this is too expensive to compute
-  // std::regex pattern("(([^=+\\*/\\^\\&;{}<>\"']+|->)+(::|\\.|->)$)");
-  std::regex pattern("(([^=+\\*/\\^\\&;{}<>\"']+)(::|\\.|->)$)");
-  std::smatch match;
-  bool result = std::regex_search(content, match, pattern);
-  if (match.size() > 0) {
-    token = match[0];
+#include <algorithm>
+#include <cstring>
+
+namespace {
+
+// characters searched backward from the cursor for the end of a token
+bool IsDelimiter(char c) {
+  switch (c) {
+    case ':': case '-': case '>': case '.': case '}': case '{': case '=':
+    case '+': case '*': case '/': case '&': case '^': case '<': case ';':
+      return true;
+    default:
+      return false;
   }
+}
 
-  // for (auto m : match) {
-  //   std::cout << "match: " << m << std::endl;
-  // }
-  // std::cout << std::endl;
-  return result;
+// characters which can not be part of a token
+bool IsSeparator(char c) {
+  switch (c) {
+    case '=': case '+': case '*': case '/': case '^': case '&': case ';':
+    case '{': case '}': case '<': case '>': case '"': case '\'':
+      return true;
+    default:
+      return false;
+  }
 }
 
-int LocateIndex(const std::string& content, int line, int column) {
-  std::string it = content;
-  int line_count = 1;
-  int index = 0;
-  while (it.length() > 0 && line_count < line) {
-    int found = it.find("\n");
-    if (found != std::string::npos) {
-      it = it.substr(found + 1);
-      index += found + 1;
-      ++line_count;
-    } else {
-      break;
-    }
+bool IsSpace(char c) {
+  return c == ' ' || c == '\t' || c == '\r' || c == '\b' || c == '\n';
+}
+
+// start of the token ending with ::, . or -> right before end,
+// std::string::npos when there is none
+size_t TokenStart(const std::string& content, size_t end) {
+  size_t accessor;
+  if (end >= 1 && content[end - 1] == '.') {
+    accessor = end - 1;
+  } else if (end >= 2 && content[end - 2] == ':' && content[end - 1] == ':') {
+    accessor = end - 2;
+  } else if (end >= 2 && content[end - 2] == '-' && content[end - 1] == '>') {
+    accessor = end - 2;
+  } else {
+    return std::string::npos;
   }
-  index += column;
-  return index - 1;
+
+  size_t start = accessor;
+  while (start > 0 && !IsSeparator(content[start - 1])) {
+    --start;
+  }
+  return start < accessor ? start : std::string::npos;
 }
 
-std::string StripToken(const std::string& token) {
+std::string StripToken(const std::string& content, size_t start,
+                       size_t end) {
   std::string result;
-  std::vector<char> space_chars = {' ', '\t', '\r', '\b', '\n'};
-  for (int i = 0; i < token.length(); ++i) {
-    bool found = false;
-    for (int j = 0; j < space_chars.size(); ++j) {
-      if (token[i] == space_chars[j]) {
-        found = true;
-      }
-    }
-    if (!found) {
-      result += token[i];
+  result.reserve(end - start);
+  for (size_t i = start; i < end; ++i) {
+    if (!IsSpace(content[i])) {
+      result += content[i];
     }
   }
   return result;
 }
 
-int FindLastOccurrence(const std::string& content,
-                       const std::vector<std::string>& delimiters) {
-  int best = -1;
-  for (int i = 0; i < delimiters.size(); ++i) {
-    int found = content.find_last_of(delimiters[i]);
-    if (found != std::string::npos && found > best) {
-      // std::cout << "found: " << delimiters[i] << ", at: " << found <<
-      // std::endl;
-      best = found;
-    }
+}  // namespace
+
+bool GetToken(const std::string& content, std::string& token) {
+  size_t start = TokenStart(content, content.size());
+  if (start == std::string::npos) {
+    return false;
   }
-  return best;
+  token = content.substr(start);
+  return true;
 }
 
-void ComputeLocation(const std::string& content, int found, int& line,
-                     int& column) {
-  std::string it = content;
-  int index = 0;
-  line = 1;
-  while (it.length() > 0) {
-    int nl = it.find("\n");
-    if (nl != std::string::npos) {
-      it = it.substr(nl + 1);
-      if (index + nl + 1 > found) {
-        break;
-      }
-      index += nl + 1;
-      ++line;
-      // std::cout << "index: " << index << ", found: " << found << std::endl;
-    } else {
+std::string FindToken(const std::string& content, int& line, int& column) {
+  // locate the cursor, the last line is used when line is past the end
+  const char* data = content.data();
+  size_t line_start = 0;
+  int line_number = 1;
+  while (line_number < line) {
+    const void* found =
+        std::memchr(data + line_start, '\n', content.size() - line_start);
+    if (found == nullptr) {
       break;
     }
+    line_start = static_cast<const char*>(found) - data + 1;
+    ++line_number;
   }
-  column = found - index + 2;
-}
+  long index = static_cast<long>(line_start) + column - 1;
+  size_t end = index < 0 || index > static_cast<long>(content.size())
+                   ? content.size()
+                   : static_cast<size_t>(index);
 
-std::string FindToken(const std::string& content, int& line, int& column) {
-  int index = LocateIndex(content, line, column);
-  std::string part = content.substr(0, index);
-  // std::cout << "part: " << part << std::endl;
+  // walk backward to the last delimiter before the cursor
+  size_t delimiter = end;
+  while (delimiter > 0 && !IsDelimiter(content[delimiter - 1])) {
+    --delimiter;
+  }
+  if (delimiter == 0) {
+    return "";
+  }
+  --delimiter;
 
-  std::vector<std::string> delimiters = {"::", "->", ".", "}", "{",
-                                         "=",  "+",  "-", "*", "/",
-                                         "&",  "^",  "<", ">", ";"};
-  int last_delimiter = FindLastOccurrence(part, delimiters);
-  if (last_delimiter != std::string::npos) {
-    part = part.substr(0, last_delimiter + 1);
-    // std::cout << "stripped part: " << part << std::endl;
-    std::string token;
-    if (GetToken(part, token)) {
-      ComputeLocation(content, last_delimiter, line, column);
-      return StripToken(token);
-    }
+  size_t start = TokenStart(content, delimiter + 1);
+  if (start == std::string::npos) {
+    return "";
+  }
+
+  if (delimiter >= line_start) {
+    line = line_number + std::count(data + line_start, data + delimiter, '\n');
+  } else {
+    line = line_number - std::count(data + delimiter, data + line_start, '\n');
+  }
+  size_t delimiter_line_start = delimiter;
+  while (delimiter_line_start > 0 && data[delimiter_line_start - 1] != '\n') {
+    --delimiter_line_start;
   }
-  return "";
+  column = delimiter - delimiter_line_start + 2;
+  return StripToken(content, start, delimiter + 1);
 }
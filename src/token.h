@@ -3,8 +3,6 @@
 
 #include <string>
 #include <vector>
-#include <iostream>
-#include <regex>
 
 bool GetToken(const std::string& content, std::string& token);
 
@@ -1,6 +1,9 @@
+#include <algorithm>
 #include <string>
 #include <sstream>
 #include <fstream>
+#include <chrono>
+#include <iostream>
 
 #include <gtest/gtest.h>
 
@@ -229,6 +232,42 @@ TEST(TestToken, FindToken5) {
   EXPECT_EQ(column, 11);
 }
 
+TEST(TestToken, FindTokenBenchmark) {
+  // about 1 MB of generated source, the cursor is placed after std::
+  // on the first and on the last line
+  std::string line_content = "  value.member = other->field + 1;\n";
+  std::string content = "  std::\n";
+  while (content.size() < 1024 * 1024) {
+    content += line_content;
+  }
+  content += "  std::\n";
+  int last_line = std::count(content.begin(), content.end(), '\n');
+
+  const int iterations = 1000;
+  double elapsed[2];
+  int lines[2] = {1, last_line};
+  for (int i = 0; i < 2; ++i) {
+    auto begin = std::chrono::steady_clock::now();
+    for (int j = 0; j < iterations; ++j) {
+      int line = lines[i];
+      int column = 8;
+      std::string token = FindToken(content, line, column);
+      ASSERT_EQ(token, "std::");
+      ASSERT_EQ(line, lines[i]);
+      ASSERT_EQ(column, 8);
+    }
+    std::chrono::duration<double, std::micro> duration =
+        std::chrono::steady_clock::now() - begin;
+    elapsed[i] = duration.count() / iterations;
+  }
+  std::cout << "first line: " << elapsed[0] << "us, last line: " << elapsed[1]
+            << "us" << std::endl;
+
+  // only the line lookup depends on the cursor position,
+  // the previous implementation needed seconds for the last line
+  EXPECT_LT(elapsed[1], 10000.0);
+}
+
 int main(int argc, char **argv) {
   ::testing::InitGoogleTest(&argc, argv);
   return RUN_ALL_TESTS();
@@ -0,0 +1,212 @@
+"""
+latency benchmark of the completion pipeline
+
+every sample is measured for cold parse, reparse, code completion at a
+fixed position, token lookup and the conversion of candidates in python.
+results are written as json and compared against a stored baseline
+
+  python3 test/benchmark.py --output result.json --baseline baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+
+current_dir = os.path.realpath(os.path.dirname(__file__))
+root_dir = os.path.join(current_dir, '..')
+plugin_dir = os.path.join(root_dir, 'rplugin', 'python3', 'deoplete')
+sys.path.append(plugin_dir)
+
+from clang_source_base import ClangCompletionWrapper
+from clang_source_base import import_library
+
+
+# (file, line, column, language)
+CASES = [
+  ('test/sample1.c', 5, 1, 'c'),
+  ('test/sample1.cc', 5, 8, 'cpp'),
+  ('test/sample2.cc', 5, 10, 'cpp'),
+  ('test/sample3.cc', 3, 11, 'cpp'),
+  ('test/sample4.cc', 12, 20, 'cpp'),
+  ('test/sample5.cc', 21, 16, 'cpp'),
+  ('rplugin/python3/deoplete/test_sources/source.cc', 8, 5, 'cpp'),
+  ('rplugin/python3/deoplete/test_sources/objects.cc', 4, 10, 'cpp'),
+  ('rplugin/python3/deoplete/test_sources/std_source.cc', 16, 8, 'cpp'),
+  ('rplugin/python3/deoplete/test_sources/std_source2.cc', 6, 5, 'cpp'),
+  ('rplugin/python3/deoplete/test_sources/opencv_source.cc', 6, 7, 'cpp'),
+  ('rplugin/python3/deoplete/test_sources/grpc_source.cc', 13, 9, 'cpp'),
+]
+
+METRICS = ['cold_parse', 'reparse', 'code_complete', 'find_token',
+  'process_candidates']
+
+
+def percentile(samples, p):
+  """
+  nearest rank percentile
+  """
+  ordered = sorted(samples)
+  rank = max(int(round(p / 100.0 * len(ordered))), 1)
+  return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples):
+  """
+  milliseconds at p50, p95 and p99
+  """
+  return {
+    'count': len(samples),
+    'mean': sum(samples) / len(samples),
+    'p50': percentile(samples, 50),
+    'p95': percentile(samples, 95),
+    'p99': percentile(samples, 99),
+  }
+
+
+def measure(function, iterations):
+  samples = []
+  for i in range(iterations):
+    start = time.perf_counter()
+    function(i)
+    samples.append((time.perf_counter() - start) * 1000.0)
+  return summarize(samples)
+
+
+def peak_rss():
+  usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def create_arg_manager(library, language):
+  if language == 'c':
+    arg_manager = library.CArgumentManager()
+  else:
+    arg_manager = library.CPPArgumentManager()
+    arg_manager.SetCPPStandard(11)
+    arg_manager.AddIncludePath('/usr/include/eigen3')
+  arg_manager.AddIncludePath('/usr/local/include')
+  return arg_manager
+
+
+def run_case(library, case, iterations, cold_iterations):
+  filename, line, column, language = case
+  filepath = os.path.realpath(os.path.join(root_dir, filename))
+  with open(filepath) as f:
+    content = f.read()
+  arg_manager = create_arg_manager(library, language)
+  result = {}
+
+  def cold_parse(i):
+    library.ClangCompleter().Parse(filepath, content, arg_manager)
+  result['cold_parse'] = measure(cold_parse, cold_iterations)
+
+  completer = library.ClangCompleter()
+  # every completion goes to clang
+  completer.set_cache_max_bytes(0)
+  completer.Parse(filepath, content, arg_manager)
+
+  def reparse(i):
+    completer.Parse(filepath, content + '\n// %d\n' % i, arg_manager)
+  result['reparse'] = measure(reparse, iterations)
+  completer.Parse(filepath, content, arg_manager)
+
+  def code_complete(i):
+    completer.CodeComplete(filepath, content, line, column, arg_manager)
+  result['code_complete'] = measure(code_complete, iterations)
+
+  def find_token(i):
+    library.FindToken(content, line, column)
+  result['find_token'] = measure(find_token, iterations * 10)
+
+  candidates = completer.CodeCompleteCandidates(filepath, content, line,
+    column, arg_manager)
+  wrapper = ClangCompletionWrapper(arg_manager)
+
+  def process_candidates(i):
+    wrapper.process_candidates(candidates)
+  result['process_candidates'] = measure(process_candidates, iterations)
+
+  result['results'] = len(candidates)
+  result['peak_rss'] = peak_rss()
+  return result
+
+
+def compare(result, baseline, tolerance, min_delta):
+  """
+  metrics whose p50 grew by more than tolerance and min_delta milliseconds
+  """
+  regressions = []
+  for name, metrics in sorted(result['cases'].items()):
+    previous = baseline.get('cases', {}).get(name)
+    if not previous:
+      continue
+    for metric in METRICS:
+      if metric not in previous or metric not in metrics:
+        continue
+      before = previous[metric]['p50']
+      after = metrics[metric]['p50']
+      if after > before * (1.0 + tolerance) and after - before > min_delta:
+        regressions.append((name, metric, before, after))
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+    formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--iterations', type=int, default=10)
+  parser.add_argument('--cold-iterations', type=int, default=3)
+  parser.add_argument('--filter', default='',
+    help='run the samples whose path contains this text')
+  parser.add_argument('--output', help='write the results to this file')
+  parser.add_argument('--baseline', help='compare against this result file')
+  parser.add_argument('--update-baseline', action='store_true',
+    help='store the results as the new baseline')
+  parser.add_argument('--tolerance', type=float, default=0.2,
+    help='allowed relative growth of p50 (default 0.2)')
+  parser.add_argument('--min-delta', type=float, default=0.5,
+    help='ignore changes below this many milliseconds (default 0.5)')
+  args = parser.parse_args()
+
+  library = import_library()
+  if not library:
+    sys.exit('clang_completer is not built, run ./install.sh first')
+
+  result = {'python': sys.version.split()[0], 'cases': {}}
+  for case in CASES:
+    if args.filter not in case[0]:
+      continue
+    name = '%s:%d:%d' % case[:3]
+    metrics = run_case(library, case, args.iterations, args.cold_iterations)
+    result['cases'][name] = metrics
+
+    print('%s (%d results)' % (name, metrics['results']))
+    for metric in METRICS:
+      print('  %-20s p50 %9.3f ms  p95 %9.3f ms  p99 %9.3f ms' % (metric,
+        metrics[metric]['p50'], metrics[metric]['p95'],
+        metrics[metric]['p99']))
+  result['peak_rss'] = peak_rss()
+  print('peak rss %.1f MB' % (result['peak_rss'] / 1024.0 / 1024.0))
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(result, f, indent=2, sort_keys=True)
+
+  if args.baseline and args.update_baseline:
+    with open(args.baseline, 'w') as f:
+      json.dump(result, f, indent=2, sort_keys=True)
+  elif args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    regressions = compare(result, baseline, args.tolerance, args.min_delta)
+    for name, metric, before, after in regressions:
+      print('regression %s %s: p50 %.3f ms -> %.3f ms' % (name, metric,
+        before, after))
+    if regressions:
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
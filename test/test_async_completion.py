@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+current_dir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(current_dir, '..', 'rplugin', 'python3',
+  'deoplete'))
+
+from clang_source_base import AsyncCompletion
+
+
+def wait_for(completion, buffer, request, timeout=5):
+  deadline = time.time() + timeout
+  while time.time() < deadline:
+    result = completion.request(buffer, request, (request,))
+    if result is not None:
+      return result
+    time.sleep(0.001)
+  raise AssertionError('completion of %r did not finish' % (request,))
+
+
+class TestAsyncCompletion(unittest.TestCase):
+  def setUp(self):
+    self.calls = []
+    self.release = threading.Event()
+    self.started = threading.Event()
+
+  def complete(self, request):
+    self.calls.append(request)
+    self.started.set()
+    self.release.wait()
+    return [request]
+
+  def test_result_is_returned_once_ready(self):
+    completion = AsyncCompletion(self.complete)
+    self.release.set()
+    self.assertIsNone(completion.request('a.cc', 'x', ('x',)))
+    self.assertEqual(wait_for(completion, 'a.cc', 'x'), ['x'])
+    self.assertEqual(self.calls, ['x'])
+
+  def test_same_request_is_not_queued_twice(self):
+    completion = AsyncCompletion(self.complete)
+    completion.request('a.cc', 'x', ('x',))
+    self.started.wait(5)
+    for _ in range(10):
+      self.assertIsNone(completion.request('a.cc', 'x', ('x',)))
+    self.release.set()
+    self.assertEqual(wait_for(completion, 'a.cc', 'x'), ['x'])
+    self.assertEqual(self.calls, ['x'])
+
+  def test_newer_request_supersedes_stale_ones(self):
+    completion = AsyncCompletion(self.complete)
+    completion.request('a.cc', 'a', ('a',))
+    self.started.wait(5)
+    # typed while the first completion is running
+    for request in ['ab', 'abc', 'abcd', 'abcde']:
+      self.assertIsNone(completion.request('a.cc', request, (request,)))
+    self.release.set()
+    self.assertEqual(wait_for(completion, 'a.cc', 'abcde'), ['abcde'])
+    # the waiting requests were dropped, only the running one was wasted
+    self.assertEqual(self.calls, ['a', 'abcde'])
+
+  def test_buffers_do_not_supersede_each_other(self):
+    completion = AsyncCompletion(self.complete)
+    self.release.set()
+    completion.request('a.cc', 'x', ('x',))
+    completion.request('b.cc', 'y', ('y',))
+    self.assertEqual(wait_for(completion, 'a.cc', 'x'), ['x'])
+    self.assertEqual(wait_for(completion, 'b.cc', 'y'), ['y'])
+
+  def test_error_is_raised_to_the_caller(self):
+    def fail(request):
+      raise RuntimeError(request)
+
+    completion = AsyncCompletion(fail)
+    completion.request('a.cc', 'x', ('x',))
+    with self.assertRaises(RuntimeError):
+      wait_for(completion, 'a.cc', 'x')
+
+
+if __name__ == '__main__':
+  unittest.main()
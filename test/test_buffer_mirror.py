@@ -0,0 +1,68 @@
+import os
+import sys
+import unittest
+
+current_dir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(current_dir, '..', 'rplugin', 'python3',
+  'deoplete'))
+
+from buffer_mirror import BufferMirror
+
+
+class FakeVim(object):
+  def __init__(self, nvim):
+    self.nvim = nvim
+    self.lines = ['int main() {', '}']
+    self.changedtick = 1
+    self.changes = []
+    self.calls = []
+
+  def call(self, name, *args):
+    self.calls.append(name)
+    if name == 'has':
+      return int(self.nvim)
+    if name == 'getbufvar':
+      return self.changedtick
+    if name == 'getbufline':
+      return list(self.lines)
+    if name == 'luaeval':
+      full = args[1][2]
+      if full:
+        return [0, -1, list(self.lines)]
+      return self.changes.pop(0) if self.changes else []
+
+
+class TestBufferMirror(unittest.TestCase):
+  def test_poll(self):
+    vim = FakeVim(False)
+    mirror = BufferMirror(vim)
+    self.assertEqual(mirror.content(1), 'int main() {\n}')
+    mirror.content(1)
+    self.assertEqual(vim.calls.count('getbufline'), 1)
+
+    vim.lines.insert(1, '  return 0;')
+    vim.changedtick += 1
+    self.assertEqual(mirror.content(1), 'int main() {\n  return 0;\n}')
+
+  def test_attach(self):
+    vim = FakeVim(True)
+    mirror = BufferMirror(vim)
+    self.assertEqual(mirror.content(1), 'int main() {\n}')
+    self.assertEqual(mirror.content(1), 'int main() {\n}')
+
+    vim.changes.append([1, 1, ['  return 0;']])
+    self.assertEqual(mirror.content(1), 'int main() {\n  return 0;\n}')
+    vim.changes.append([0, 2, ['int f() {']])
+    self.assertEqual(mirror.content(1), 'int f() {\n}')
+
+  def test_retain(self):
+    vim = FakeVim(True)
+    mirror = BufferMirror(vim)
+    mirror.content(1)
+    mirror.retain(set([2]))
+    vim.lines = ['void f();']
+    self.assertEqual(mirror.content(1), 'void f();')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+
+current_dir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(current_dir, '..', 'rplugin', 'python3',
+  'deoplete'))
+
+from compilation_database import CompilationDatabase, parse_command
+
+
+class TestParseCommand(unittest.TestCase):
+  def test_command(self):
+    flags = parse_command({
+      'directory': '/project/build',
+      'command': 'g++ -I../include -isystem /opt/include -DDEBUG '
+        '-std=c++14 -o main.o -c ../src/main.cc',
+      'file': '../src/main.cc',
+    })
+    self.assertEqual(flags, ['-I/project/include',
+      '-isystem/opt/include', '-DDEBUG', '-std=c++14'])
+
+  def test_arguments(self):
+    flags = parse_command({
+      'directory': '/project',
+      'arguments': ['clang', '-x', 'c++', '-include', 'config.h',
+        '-MD', '-MF', 'main.d', '-c', 'main.cc'],
+      'file': 'main.cc',
+    })
+    self.assertEqual(flags, ['-xc++', '-include/project/config.h'])
+
+
+class TestCompilationDatabase(unittest.TestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.path = os.path.join(self.root, 'compile_commands.json')
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+  def write(self, entries):
+    with open(self.path, 'w') as f:
+      json.dump(entries, f)
+
+  def entry(self, name, definition):
+    return {
+      'directory': self.root,
+      'arguments': ['cc', '-D' + definition, '-c', name],
+      'file': name,
+    }
+
+  def test_lookup(self):
+    self.write([self.entry('a.cc', 'A'), self.entry('b.cc', 'B')])
+    database = CompilationDatabase(self.path)
+    self.assertEqual(len(database), 2)
+    self.assertEqual(database.get_flags(os.path.join(self.root, 'b.cc')),
+      ['-DB'])
+    # headers use a source in the same directory
+    self.assertIsNotNone(database.get_flags(os.path.join(self.root, 'a.h')))
+    self.assertIsNone(database.get_flags('/elsewhere/a.h'))
+
+  def test_reload(self):
+    self.write([self.entry('a.cc', 'A')])
+    database = CompilationDatabase(self.path)
+    self.assertEqual(database.get_flags(os.path.join(self.root, 'a.cc')),
+      ['-DA'])
+
+    self.write([self.entry('a.cc', 'CHANGED')])
+    mtime = time.time() + 10
+    os.utime(self.path, (mtime, mtime))
+    self.assertEqual(database.get_flags(os.path.join(self.root, 'a.cc')),
+      ['-DCHANGED'])
+
+  def test_missing(self):
+    database = CompilationDatabase(self.path)
+    self.assertEqual(len(database), 0)
+    self.assertIsNone(database.get_flags(os.path.join(self.root, 'a.cc')))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import random
+import unittest
+
+current_dir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(current_dir, '..', 'rplugin', 'python3',
+  'deoplete'))
+
+from identifier_index import IDENTIFIER
+from identifier_index import IdentifierIndex
+
+
+def scan(lines):
+  counts = {}
+  for line in lines:
+    for word in IDENTIFIER.findall(line):
+      counts[word] = counts.get(word, 0) + 1
+  return counts
+
+
+class TestIdentifierIndex(unittest.TestCase):
+  def test_replace(self):
+    index = IdentifierIndex()
+    index.replace(1, 0, None, ['int alpha = 1;', 'int beta = alpha;'])
+    self.assertEqual(set(index.identifiers()),
+      set(['int', 'alpha', 'beta']))
+
+    # beta is gone once its line is replaced
+    index.replace(1, 1, 2, ['int gamma = 2;'])
+    self.assertEqual(set(index.identifiers()),
+      set(['int', 'alpha', 'gamma']))
+    self.assertNotIn('1', index.identifiers())
+
+  def test_ranking(self):
+    index = IdentifierIndex()
+    index.replace(1, 0, None, ['rare common', 'common', 'common'])
+    self.assertEqual(index.identifiers(), ['common', 'rare'])
+
+    # the latest edit comes first
+    index.replace(1, 3, 3, ['fresh'])
+    self.assertEqual(index.identifiers(), ['fresh', 'common', 'rare'])
+
+  def test_max_identifiers(self):
+    index = IdentifierIndex(max_identifiers=2)
+    index.replace(1, 0, None, ['a b b c c c'])
+    self.assertEqual(index.identifiers(), ['c', 'b'])
+
+  def test_buffers(self):
+    index = IdentifierIndex()
+    index.replace(1, 0, None, ['shared one'])
+    index.replace(2, 0, None, ['shared two'])
+    self.assertEqual(index.identifiers()[:2], ['shared', 'two'])
+
+    index.retain(set([2]))
+    self.assertEqual(set(index.identifiers()), set(['shared', 'two']))
+
+  def test_matches_full_scan(self):
+    random.seed(0)
+    words = ['foo', 'bar', 'baz', 'qux', '_x1', '42']
+    lines = []
+    index = IdentifierIndex(max_identifiers=0)
+    index.replace(1, 0, None, lines)
+    for _ in range(500):
+      first = random.randint(0, len(lines))
+      last = random.randint(first, min(len(lines), first + 3))
+      new = [' '.join(random.choice(words) for _ in range(3))
+        for _ in range(random.randint(0, 3))]
+      lines[first:last] = new
+      index.replace(1, first, last, new)
+      self.assertEqual(set(index.identifiers()), set(scan(lines)))
+
+  def test_large_buffer(self):
+    lines = ['  int value%d = compute(value%d, %d);' % (i, i - 1, i)
+      for i in range(50000)]
+    index = IdentifierIndex()
+    start = time.perf_counter()
+    index.replace(1, 0, None, lines)
+    index.identifiers()
+    scanned = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(100):
+      index.replace(1, 25000, 25001, ['  int edited%d = 0;' % i])
+    edited = (time.perf_counter() - start) / 100
+    print('\n50k lines scanned in %.1f ms, one line edit in %.3f ms' % (
+      scanned * 1000, edited * 1000))
+    self.assertEqual(len(index.identifiers()), 10000)
+    self.assertEqual(set(index.identifiers()[:2]), set(['int', 'edited99']))
+
+
+if __name__ == '__main__':
+  unittest.main()
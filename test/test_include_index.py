@@ -0,0 +1,50 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+current_dir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(current_dir, '..', 'rplugin', 'python3',
+  'deoplete'))
+
+from include_index import IncludeIndex
+
+
+class TestIncludeIndex(unittest.TestCase):
+  def setUp(self):
+    self.root = os.path.realpath(tempfile.mkdtemp())
+    self.cache = tempfile.mkdtemp()
+    for path in ['include', 'lib/src', 'build/sub/include', '.git/include',
+        'node_modules/pkg/include']:
+      os.makedirs(os.path.join(self.root, path))
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+    shutil.rmtree(self.cache)
+
+  def path(self, name):
+    return os.path.join(self.root, name) + os.sep
+
+  def test_directories(self):
+    index = IncludeIndex(self.root, cache_directory=self.cache)
+    self.assertEqual(index.directories(), [self.path('build'),
+      self.path('include'), self.path('lib/src')])
+
+  def test_excludes(self):
+    index = IncludeIndex(self.root, ['lib'], cache_directory=self.cache)
+    self.assertIn(self.path('.git/include'), index.directories())
+    self.assertNotIn(self.path('lib/src'), index.directories())
+
+  def test_revalidate(self):
+    IncludeIndex(self.root, cache_directory=self.cache).directories()
+    os.makedirs(os.path.join(self.root, 'lib', 'include'))
+
+    index = IncludeIndex(self.root, cache_directory=self.cache)
+    index.directories()
+    index.revalidate()
+    self.assertIn(self.path('lib/include'), index.directories())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,43 @@
+import os
+import sys
+import subprocess
+import unittest
+from unittest import mock
+
+current_dir = os.path.realpath(os.path.dirname(__file__))
+plugin_dir = os.path.join(current_dir, '..', 'rplugin', 'python3', 'deoplete')
+sys.path.append(plugin_dir)
+
+import clang_source_base
+
+MEASURE = '''
+import sys
+import time
+sys.path.insert(0, %r)
+start = time.perf_counter()
+import clang_source_base
+elapsed = time.perf_counter() - start
+print(elapsed * 1000, 'clang_completer' in sys.modules)
+'''
+
+
+class TestStartup(unittest.TestCase):
+  def test_import_is_lazy(self):
+    output = subprocess.check_output([sys.executable, '-c',
+      MEASURE % plugin_dir]).decode()
+    elapsed, loaded = output.split()
+    print('\nclang_source_base imported in %.1f ms' % float(elapsed))
+    self.assertEqual(loaded, 'False')
+
+  def test_import_library_once(self):
+    module = mock.Mock()
+    with mock.patch.object(clang_source_base, '_library', None), \
+        mock.patch('ctypes.cdll.LoadLibrary') as load, \
+        mock.patch.dict(sys.modules, {'clang_completer': module}):
+      self.assertIs(clang_source_base.import_library(), module)
+      self.assertIs(clang_source_base.import_library(), module)
+      self.assertEqual(load.call_count, 1)
+
+
+if __name__ == '__main__':
+  unittest.main()